@@ -1,148 +1,106 @@
 import os
-import aiohttp
+import sys
 import asyncio
 import pandas as pd
+from datetime import date
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from models import StockPrice
+from validation import validate_stock_prices
+from http_client import fetch_alpha_vantage_decoded, close_session
+from stream_parser import DailySeriesDecoder
 from database import postgres_engine
-from sqlalchemy import Table, Column, Float, String, Date, Integer, MetaData, text
+from sqlalchemy import text
+from schema import stock_table
+from migrations import run_migrations
+from price_store import refresh_price_store
+from bulk_loader import copy_dataframe
+from write_behind import WriteBehindWriter
 
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-BASE_URL = "https://www.alphavantage.co/query"
 
-# Define SQLAlchemy table for PostgreSQL
-metadata = MetaData()
-
-stock_table = Table("stock_prices", metadata,
-    Column("date", Date),
-    Column("open", Float),
-    Column("high", Float),
-    Column("low", Float),
-    Column("close", Float),
-    Column("volume", Integer),
-    Column("symbol", String)
-)
-
-metadata.create_all(postgres_engine)
-
-@retry(
-    retry=retry_if_exception_type(aiohttp.ClientError),
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=2, max=30)
-)
+# "compact" returns the latest 100 trading days (~140 calendar days); stay well inside that
+COMPACT_WINDOW_DAYS = 120
 
 def clear_stock_prices_table():
     with postgres_engine.begin() as conn:
         conn.execute(text("DELETE FROM stock_prices"))
         print("🧹 Cleared previous stock data from PostgreSQL.")
 
-async def fetch_daily_stock(symbol):
+def get_high_water_marks():
+    """Latest stored bar date per symbol."""
+    with postgres_engine.connect() as conn:
+        rows = conn.execute(text("SELECT symbol, MAX(date) FROM stock_prices GROUP BY symbol"))
+        return {symbol: last_date for symbol, last_date in rows}
+
+def choose_outputsize(last_date):
+    if last_date is None:
+        return "full"
+    return "compact" if (date.today() - last_date).days <= COMPACT_WINDOW_DAYS else "full"
+
+async def fetch_daily_stock(symbol, outputsize="full"):
     params = {
         "function": "TIME_SERIES_DAILY",
         "symbol": symbol,
         "apikey": API_KEY,
-        "outputsize": "full"
+        "outputsize": outputsize
     }
 
-    headers = {"User-Agent": "Mozilla/5.0"}
+    # Bars are decoded incrementally into typed column arrays as the body streams in
+    capacity = 128 if outputsize == "compact" else 8192
+    return await fetch_alpha_vantage_decoded(params, lambda: DailySeriesDecoder(capacity))
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(BASE_URL, params=params, headers=headers) as resp:
-            if resp.status == 429:
-                raise aiohttp.ClientError("Rate limit hit. Retrying...")
-            elif resp.status != 200:
-                raise aiohttp.ClientError(f"API error: {resp.status}")
-            return await resp.json()
-
-def parse_daily_stock(json_data, symbol):
-    if "Time Series (Daily)" not in json_data:
+def parse_daily_stock(series, symbol):
+    if isinstance(series, dict):
         print(f"[{symbol}] ⚠️ No 'Time Series (Daily)' in response.")
-        print(json_data)
+        print(series)
         return None
 
-    time_series = json_data["Time Series (Daily)"]
-    df = pd.DataFrame(time_series).T
-
-    df.index = pd.to_datetime(df.index)
-    df = df.sort_index(ascending=False)
-
-    df.rename(columns={
-        "1. open": "open",
-        "2. high": "high",
-        "3. low": "low",
-        "4. close": "close",
-        "5. volume": "volume"
-    }, inplace=True)
-
-    numeric_cols = ["open", "high", "low", "close", "volume"]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = series.dropna(subset=["close"]).assign(symbol=symbol)
 
-    df.dropna(subset=["close"], inplace=True)
+    # ✅ Columnar validation (same rules as models.StockPrice)
+    df_clean, _ = validate_stock_prices(df, symbol)
 
-    df["symbol"] = symbol
-    df.reset_index(inplace=True)
-    df.rename(columns={"index": "date"}, inplace=True)
-    df["date"] = df["date"].astype(str)  # Ensure date is string for pydantic
-
-    # ✅ Validate using Pydantic
-    valid_rows = []
-    for row in df.to_dict(orient="records"):
-        try:
-            validated = StockPrice(**row)
-            valid_rows.append(validated.dict())
-        except Exception as e:
-            print(f"[{symbol}] Skipping invalid row: {e}")
-
-    if not valid_rows:
+    if df_clean.empty:
         print(f"[{symbol}] ❌ No valid data to return after validation.")
         return None
 
-    df_clean = pd.DataFrame(valid_rows)
-
-    # ✅ Fix encoding to prevent UnicodeDecodeError
-    for col in df_clean.select_dtypes(include=["object"]).columns:
-        df_clean[col] = df_clean[col].astype(str).apply(lambda x: x.encode("utf-8", "replace").decode("utf-8"))
-
-    return df_clean
+    return df_clean.reset_index(drop=True)
 
 def save_to_postgres(df):
+    # Errors propagate so the write-behind writer reports the failed batch instead of counting it
     if df is not None and not df.empty:
-        df = enforce_utf8(df)  # 💡 Apply fix here
+        # COPY through a staging table and upsert on the (symbol, date) key so re-fetched bars overwrite
+        written = copy_dataframe(df, stock_table, conflict_columns=["symbol", "date"], on_conflict="update")
+        print(f"✅ Saved {written} rows to PostgreSQL.")
+        return written
+    return 0
 
-        try:
-            with postgres_engine.begin() as conn:
-                conn.execute(stock_table.insert(), df.to_dict(orient="records"))
-                print(f"✅ Saved {len(df)} rows to PostgreSQL.")
-        except Exception as e:
-            print(f"❌ Database insertion error: {e}")
-            
-def enforce_utf8(df):
-    for col in df.select_dtypes(include=["object"]).columns:
-        df[col] = df[col].astype(str).apply(
-            lambda x: x.encode("utf-8", errors="replace").decode("utf-8", errors="ignore")
-        )
-    return df
-
-async def fetch_and_parse(symbol):
+async def fetch_and_parse(symbol, last_date=None, writer=None):
     try:
-        raw = await fetch_daily_stock(symbol)
+        outputsize = choose_outputsize(last_date)
+        raw = await fetch_daily_stock(symbol, outputsize)
 
-        if "Note" in raw:
+        if isinstance(raw, dict) and "Note" in raw:
             print(f"[{symbol}] ⚠️ Rate limit notice: {raw['Note']}")
             return None
-        if "Error Message" in raw:
+        if isinstance(raw, dict) and "Error Message" in raw:
             print(f"[{symbol}] ❌ API error: {raw['Error Message']}")
             return None
 
         df = parse_daily_stock(raw, symbol)
 
+        if df is not None and last_date is not None:
+            # Re-upsert the last stored bar (it may have been taken intraday) plus anything newer
+            df = df[pd.to_datetime(df["date"]).dt.date >= last_date]
+            print(f"[{symbol}] 🔁 Incremental ({outputsize}): {len(df)} bars since {last_date}.")
+
         if df is not None:
             print(df.head())
-            save_to_postgres(df)
+            if writer is not None:
+                await writer.submit(df)  # written behind by the DB thread
+            else:
+                save_to_postgres(df)
         else:
             print(f"[{symbol}] No valid data parsed.")
 
@@ -155,9 +113,22 @@ async def fetch_and_parse(symbol):
 if __name__ == "__main__":
     symbols = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "JPM", "BAC", "WFC", "GS", "MS", "XOM", "CVX", "BP", "COP", "UNH", "JNJ", "PFE", "MRK", "LLY"]
 
-    async def main():
-        tasks = [fetch_and_parse(sym) for sym in symbols]
-        await asyncio.gather(*tasks)
+    # Incremental by default; pass --full to truncate and reload the complete history
+    full_reload = "--full" in sys.argv
+
+    async def main(high_water_marks):
+        try:
+            async with WriteBehindWriter(save_to_postgres, label="stock_prices") as writer:
+                tasks = [fetch_and_parse(sym, high_water_marks.get(sym), writer) for sym in symbols]
+                await asyncio.gather(*tasks)
+        finally:
+            await close_session()
     
-    clear_stock_prices_table()
-    asyncio.run(main())
+    run_migrations()
+    if full_reload:
+        clear_stock_prices_table()
+        high_water_marks = {}
+    else:
+        high_water_marks = get_high_water_marks()
+    asyncio.run(main(high_water_marks))
+    refresh_price_store()
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "cache/answers.sqlite")
+# Cosine similarity between question embeddings above which a cached answer is reused
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers. An entry is reused for a question whose
+    embedding is within the similarity threshold of the cached one, with the same
+    resolved (symbol, start, end) scope and built from the same index versions.
+    Entries expire after ttl seconds; beyond max_entries the least recently used
+    go first. Entries from older index versions are purged when new ones are stored.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                scope TEXT NOT NULL,
+                versions TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope, versions)")
+        self._db.commit()
+
+    @staticmethod
+    def scope(symbol, start_date, end_date):
+        return json.dumps([symbol.upper() if symbol else None, start_date, end_date])
+
+    def get(self, vector, symbol, start_date, end_date, versions):
+        """Cached answer for the closest matching question, or None."""
+        query = _unit(vector)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, question, vector, answer FROM answers WHERE scope = ? AND versions = ? AND created > ?",
+                (self.scope(symbol, start_date, end_date), json.dumps(versions), time.time() - self.ttl),
+            ).fetchall()
+            if not rows:
+                return None
+            vectors = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+            scores = vectors @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entry_id, question, _, answer = rows[best]
+            self._db.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+            self._db.commit()
+        print(f"⚡ Answer cache hit (similarity {scores[best]:.3f} to {question!r}).")
+        return answer
+
+    def put(self, question, vector, symbol, start_date, end_date, versions, answer):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers (scope, versions, question, vector, answer, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.scope(symbol, start_date, end_date), json.dumps(versions), question,
+                 _unit(vector).tobytes(), answer, now, now),
+            )
+            # Invalidation: answers built on other index versions or past their TTL can never be served again
+            self._db.execute("DELETE FROM answers WHERE versions != ? OR created <= ?",
+                             (json.dumps(versions), now - self.ttl))
+            self._db.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Process-wide cache, opened on first use so importing this module touches no files."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
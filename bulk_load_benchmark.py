@@ -0,0 +1,79 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table, Column, Float, String, Date, Integer, MetaData
+from database import postgres_engine
+from bulk_loader import copy_dataframe
+
+# Scratch table with the stock_prices layout and its (symbol, date) key
+metadata = MetaData()
+
+bench_table = Table("stock_prices_bench", metadata,
+    Column("date", Date),
+    Column("open", Float),
+    Column("high", Float),
+    Column("low", Float),
+    Column("close", Float),
+    Column("volume", Integer),
+    Column("symbol", String)
+)
+
+
+def make_prices(n_symbols, n_days):
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n_days)
+    symbols = [f"SYM{i:03d}" for i in range(n_symbols)]
+    rng = np.random.default_rng(0)
+    n = n_symbols * n_days
+    close = rng.uniform(10, 500, n)
+    return pd.DataFrame({
+        "date": np.tile(dates.date, n_symbols),
+        "open": close * rng.uniform(0.98, 1.02, n),
+        "high": close * 1.03,
+        "low": close * 0.97,
+        "close": close,
+        "volume": rng.integers(1_000, 50_000_000, n),
+        "symbol": np.repeat(symbols, n_days)
+    })
+
+
+def reset_table():
+    with postgres_engine.begin() as conn:
+        bench_table.drop(conn, checkfirst=True)
+        bench_table.create(conn)
+        conn.exec_driver_sql("CREATE UNIQUE INDEX ON stock_prices_bench (symbol, date)")
+
+
+def timed(label, fn, rows):
+    reset_table()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.2f}s  {rows / elapsed:12,.0f} rows/s")
+    return elapsed
+
+
+def run_benchmark(n_symbols=20, n_days=5000):
+    df = make_prices(n_symbols, n_days)
+    rows = len(df)
+    print(f"📊 Loading {rows:,} rows ({n_symbols} symbols x {n_days} days)\n")
+
+    def executemany():
+        with postgres_engine.begin() as conn:
+            conn.execute(bench_table.insert(), df.to_dict(orient="records"))
+
+    baseline = timed("executemany INSERT (current)", executemany, rows)
+    copy_time = timed("COPY append", lambda: copy_dataframe(df, bench_table), rows)
+    merge_time = timed("COPY + staging merge", lambda: copy_dataframe(
+        df, bench_table, conflict_columns=["symbol", "date"], on_conflict="update"), rows)
+
+    print(f"\n⚡ COPY speedup: {baseline / copy_time:.1f}x, COPY + merge speedup: {baseline / merge_time:.1f}x")
+
+    with postgres_engine.begin() as conn:
+        bench_table.drop(conn, checkfirst=True)
+
+
+if __name__ == "__main__":
+    # Usage: python bulk_load_benchmark.py [n_symbols] [n_days]
+    args = [int(a) for a in sys.argv[1:3]]
+    run_benchmark(*args)
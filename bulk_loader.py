@@ -0,0 +1,83 @@
+import io
+from sqlalchemy import Integer
+from database import postgres_engine
+
+# Rows per COPY round trip; keeps the CSV buffer bounded for full-history loads
+COPY_CHUNK_ROWS = 100_000
+
+
+def _prepare_frame(df, table, columns):
+    frame = df[columns].copy()
+    for col in columns:
+        # Integer columns arrive as float when NaNs are present; COPY rejects "123.0"
+        if isinstance(table.c[col].type, Integer) and frame[col].dtype.kind == "f":
+            frame[col] = frame[col].round().astype("Int64")
+    return frame
+
+
+def _copy_chunks(cursor, frame, target, columns):
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    sql = f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    for start in range(0, len(frame), COPY_CHUNK_ROWS):
+        buffer = io.StringIO()
+        frame.iloc[start:start + COPY_CHUNK_ROWS].to_csv(buffer, index=False, header=False, na_rep="\\N")
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+
+
+def copy_dataframe(df, table, conflict_columns=None, on_conflict=None, engine=postgres_engine):
+    """
+    Bulk-load a DataFrame into `table` (a SQLAlchemy Table) with COPY FROM STDIN.
+
+    on_conflict=None appends straight into the table. "update" / "ignore" COPY into a
+    temporary staging table first and merge with INSERT ... ON CONFLICT, using
+    conflict_columns as the key (required for "update").
+    Returns the number of rows written.
+    """
+    if df is None or df.empty:
+        return 0
+    if on_conflict not in (None, "update", "ignore"):
+        raise ValueError(f"Unknown on_conflict mode: {on_conflict}")
+    if on_conflict == "update" and not conflict_columns:
+        raise ValueError("on_conflict='update' requires conflict_columns")
+
+    columns = [c.name for c in table.columns if c.name in df.columns]
+    frame = _prepare_frame(df, table, columns)
+    target = f'"{table.name}"'
+    column_list = ", ".join(f'"{c}"' for c in columns)
+
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        try:
+            if on_conflict is None:
+                _copy_chunks(cursor, frame, target, columns)
+                return len(frame)
+
+            staging = f'"_stage_{table.name}"'
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            _copy_chunks(cursor, frame, staging, columns)
+
+            if conflict_columns:
+                keys = ", ".join(f'"{c}"' for c in conflict_columns)
+                # DISTINCT ON keeps one row per key; ON CONFLICT DO UPDATE cannot touch a row twice
+                select = f"SELECT DISTINCT ON ({keys}) {column_list} FROM {staging}"
+                conflict_target = f"({keys})"
+            else:
+                select = f"SELECT {column_list} FROM {staging}"
+                conflict_target = ""
+
+            if on_conflict == "update":
+                updates = [c for c in columns if c not in conflict_columns]
+                set_clause = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in updates)
+                action = f"DO UPDATE SET {set_clause}" if updates else "DO NOTHING"
+            else:
+                action = "DO NOTHING"
+
+            cursor.execute(
+                f"INSERT INTO {target} ({column_list}) {select} ON CONFLICT {conflict_target} {action}"
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
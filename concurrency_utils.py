@@ -0,0 +1,50 @@
+import time
+import asyncio
+from collections import defaultdict
+
+
+class BoundedExecutor:
+    """
+    Runs async jobs concurrently with a global cap, a cap per remote host and a
+    per-job timeout, printing progress as jobs finish. A failed or timed-out job
+    is reported and yields None; it never cancels the others.
+
+    The per-host cap also bounds how many jobs can be queued on a shared rate
+    limiter at once, so the per-job timeout only has to cover a few quota slots.
+    """
+
+    def __init__(self, max_concurrency=8, per_host_limit=4, timeout=120, label="jobs"):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.label = label
+
+    async def run(self, jobs):
+        """
+        jobs: list of (name, host, coroutine_factory) tuples.
+        Returns the job results in input order (None for failures).
+        """
+        total = len(jobs)
+        overall = asyncio.Semaphore(self.max_concurrency)
+        hosts = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        done = 0
+        started = time.perf_counter()
+
+        async def run_one(name, host, factory):
+            nonlocal done
+            async with hosts[host], overall:
+                job_start = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(factory(), timeout=self.timeout)
+                    status = "✅"
+                except asyncio.TimeoutError:
+                    result, status = None, f"⏰ timed out after {self.timeout}s"
+                except Exception as e:
+                    result, status = None, f"❌ {e}"
+                done += 1
+                print(f"[{self.label}] {done}/{total} {name} {status} ({time.perf_counter() - job_start:.1f}s)")
+                return result
+
+        results = await asyncio.gather(*[run_one(*job) for job in jobs])
+        print(f"[{self.label}] 🏁 {total} jobs finished in {time.perf_counter() - started:.1f}s")
+        return results
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Approximate prompt tokens for the packed context, in total and per index
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+CONTEXT_SOURCE_BUDGETS = {
+    name: int(budget) for name, budget in (
+        item.split("=", 1) for item in os.getenv(
+            "CONTEXT_SOURCE_BUDGETS", "news=1500,financial=1200,econ=500,price=800"
+        ).replace(" ", "").split(",") if "=" in item
+    )
+}
+# MMR trade-off: 1.0 ranks purely by relevance, lower values favour chunks unlike those already picked
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Chunks this similar to one already packed add nothing and are dropped
+CONTEXT_REDUNDANCY_THRESHOLD = float(os.getenv("CONTEXT_REDUNDANCY_THRESHOLD", "0.95"))
+# Chars per token for English text; no tokenizer call per chunk
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def pack_context(hits, embeddings, token_budget=CONTEXT_TOKEN_BUDGET, source_budgets=CONTEXT_SOURCE_BUDGETS,
+                 mmr_lambda=CONTEXT_MMR_LAMBDA, redundancy_threshold=CONTEXT_REDUNDANCY_THRESHOLD):
+    """
+    Choose the documents for the prompt from merged (Document, relevance, source)
+    hits: greedy MMR over the chunk embeddings, skipping exact repeats and chunks
+    nearly identical to one already chosen, until the total and per-source token
+    budgets are spent. Returns the chosen documents in selection order.
+    """
+    if not hits:
+        return []
+
+    # Exact repeats (same chunk text from two indexes or two records) collapse to the best-scored copy
+    seen, candidates = set(), []
+    for doc, score, source in sorted(hits, key=lambda hit: hit[1], reverse=True):
+        text = " ".join(doc.page_content.split())
+        if text not in seen:
+            seen.add(text)
+            candidates.append((doc, score, source))
+
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc, _, _ in candidates]), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    relevance = np.array([score for _, score, _ in candidates], dtype=np.float32)
+    tokens = [estimate_tokens(doc.page_content) for doc, _, _ in candidates]
+
+    remaining = list(range(len(candidates)))
+    max_similarity = np.full(len(candidates), -1.0, dtype=np.float32)
+    used, used_by_source = 0, {}
+    chosen, redundant, over_budget = [], 0, 0
+
+    while remaining:
+        mmr = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * np.maximum(max_similarity[remaining], 0)
+        i = remaining.pop(int(np.argmax(mmr)))
+        doc, score, source = candidates[i]
+
+        if max_similarity[i] >= redundancy_threshold:
+            redundant += 1
+            continue
+        source_budget = source_budgets.get(source)
+        if used + tokens[i] > token_budget or (
+                source_budget is not None and used_by_source.get(source, 0) + tokens[i] > source_budget):
+            over_budget += 1
+            continue
+
+        chosen.append(i)
+        used += tokens[i]
+        used_by_source[source] = used_by_source.get(source, 0) + tokens[i]
+        max_similarity = np.maximum(max_similarity, vectors @ vectors[i])
+
+    # Relevance retained: share of the candidates' total similarity, and how many of the best 5 made it in
+    total_tokens = sum(tokens)
+    retained = relevance[chosen].sum() / max(relevance.sum(), 1e-12)
+    top = set(range(min(5, len(candidates))))
+    per_source = ", ".join(f"{source} {n}" for source, n in sorted(used_by_source.items()))
+    print(
+        f"📦 Context: {len(chosen)}/{len(hits)} chunks, ~{used:,} of ~{total_tokens:,} tokens ({per_source}) | "
+        f"relevance retained {retained:.0%}, top-5 kept {len(top & set(chosen))}/{len(top)} | "
+        f"dropped {len(hits) - len(candidates)} repeats, {redundant} near-duplicates, {over_budget} over budget"
+    )
+    return [candidates[i][0] for i in chosen]
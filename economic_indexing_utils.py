@@ -8,45 +8,47 @@ Created on Sun Apr 20 09:15:42 2025
 import os
 import pandas as pd
 from database import postgres_engine
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from index_maintenance import sync_index, source_watermark
+from embedding_cache import gemini_embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+embeddings = gemini_embeddings()
 splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
 
+ECON_INDEX_PATH = "faiss_econ_index"
+ECON_SIGNATURE_SQL = "SELECT COUNT(*), MAX(date), SUM(value) FROM economic_indicators"
+ECON_RECORDS_VERSION = 2
+
 def load_economic_indicators():
     query = "SELECT * FROM economic_indicators ORDER BY date DESC"
     df = pd.read_sql(query, postgres_engine)
     return df
 
 def convert_to_text_blocks(df):
-    text_blocks = []
-    for _, row in df.iterrows():
-        text = (
-            f"Date: {row['date']}\n"
-            f"Indicator: {row['indicator']}\n"
-            f"Value: {row['value']} {row.get('unit', '')}\n"
-        )
-        text_blocks.append(text.strip())
-    return text_blocks
-
-def build_economic_faiss_index():
+    unit = df["unit"].astype(str) if "unit" in df.columns else ""
+    text = (
+        "Date: " + df["date"].astype(str) + "\n"
+        + "Indicator: " + df["indicator"].astype(str) + "\n"
+        + "Value: " + df["value"].astype(str) + " " + unit + "\n"
+    )
+    return text.str.strip().tolist()
+
+def build_economic_faiss_index(watermark=None):
+    watermark = watermark or source_watermark(ECON_SIGNATURE_SQL)
     df = load_economic_indicators()
     if df.empty:
         print("⚠️ No economic indicators found.")
         return
 
     texts = convert_to_text_blocks(df)
-    chunks = []
-    metadata = []
+    records = []
 
-    for t in texts:
+    # Keyed by indicator:date so only new or revised observations are embedded
+    for t, indicator, date in zip(texts, df["indicator"], df["date"]):
         splits = splitter.split_text(t)
-        chunks.extend(splits)
-        metadata.extend([{"source": "economic_indicator"}] * len(splits))
+        metadata = {"source": "economic_indicator", "indicator": indicator, "date": str(date)}
+        records.append((f"{indicator}:{date}", splits, [metadata] * len(splits)))
 
-    vector_store = FAISS.from_texts(chunks, embeddings, metadatas=metadata)
-    vector_store.save_local("faiss_econ_index")
-    print("✅ FAISS index with economic indicators saved.")
+    sync_index(ECON_INDEX_PATH, records, embeddings, watermark=watermark,
+               records_version=ECON_RECORDS_VERSION, label="econ index")
@@ -6,28 +6,21 @@ Created on Fri Apr 18 23:32:49 2025
 """
 
 import os
-import aiohttp
 import asyncio
 import pandas as pd
 from dotenv import load_dotenv
-from models import EconomicIndicator
-from database import postgres_engine
+from validation import validate_economic_indicators
+from http_client import fetch_alpha_vantage, close_session
+from concurrency_utils import BoundedExecutor
+from write_behind import WriteBehindWriter
+from bulk_loader import copy_dataframe
 from sqlalchemy import text
 from datetime import datetime
-from sqlalchemy import Table, Column, String, Float, Date, MetaData
+from schema import economic_table
+from migrations import run_migrations
 load_dotenv()
 API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 
-metadata = MetaData()
-
-economic_table = Table("economic_indicators", metadata,
-    Column("indicator", String),
-    Column("date", Date),
-    Column("value", Float),
-)
-
-metadata.create_all(postgres_engine)
-
 INDICATORS = {
     "CPI": "CPI",
     "Inflation": "INFLATION",
@@ -36,59 +29,62 @@ INDICATORS = {
 }
 
 async def fetch_indicator(indicator_name, function_name):
-    url = "https://www.alphavantage.co/query"
     params = {
         "function": function_name,
         "apikey": API_KEY
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            raw = await resp.json()
-            return raw
+    return await fetch_alpha_vantage(params)
 
 def parse_indicator(indicator_name, raw_data):
     key = "data"
-    records = raw_data.get(key, [])
-    parsed = []
-
-    for r in records:
-        try:
-            validated = EconomicIndicator(
-                indicator=indicator_name,
-                date=r["date"],
-                value=float(r["value"]) if r["value"] else None
-            )
-            parsed.append(validated.dict())
-        except Exception as e:
-            print(f"[{indicator_name}] Skipped row: {e}")
+    records = pd.DataFrame(raw_data.get(key, [])).reindex(columns=["date", "value"])
+    records["indicator"] = indicator_name
 
+    parsed, _ = validate_economic_indicators(records, indicator_name)
     return parsed
 
 def save_to_postgres(data):
-    if data:
-        with postgres_engine.begin() as conn:
-            conn.execute(economic_table.insert(), data)
-            print(f"✅ Saved {len(data)} rows to PostgreSQL.")
+    if data is not None and not data.empty:
+        # Revised observations overwrite the stored value
+        written = copy_dataframe(data, economic_table, conflict_columns=["indicator", "date"], on_conflict="update")
+        print(f"✅ Saved {written} rows to PostgreSQL.")
+        return written
+    return 0
 
-async def main():
-    for name, function in INDICATORS.items():
-        raw = await fetch_indicator(name, function)
-    
-        # 🧪 Diagnostic checks:
-        print(f"\n🟡 Raw response for {name}:")
-        print(raw if raw else "❌ No response received.")
-    
-        # Check for rate limit or API error
-        if "Note" in raw:
-            print(f"⚠️ Rate limit notice for {name}: {raw['Note']}")
-            continue
-        if "Error Message" in raw:
-            print(f"❌ API error for {name}: {raw['Error Message']}")
-            continue
-    
-        parsed = parse_indicator(name, raw)
+async def ingest_indicator(name, function, writer=None):
+    raw = await fetch_indicator(name, function)
+
+    # 🧪 Diagnostic checks:
+    print(f"\n🟡 Raw response for {name}:")
+    print(raw if raw else "❌ No response received.")
+
+    # Check for rate limit or API error
+    if "Note" in raw:
+        print(f"⚠️ Rate limit notice for {name}: {raw['Note']}")
+        return None
+    if "Error Message" in raw:
+        print(f"❌ API error for {name}: {raw['Error Message']}")
+        return None
+
+    parsed = parse_indicator(name, raw)
+    if writer is not None:
+        await writer.submit(parsed)
+    else:
         save_to_postgres(parsed)
+    return parsed
+
+async def main():
+    executor = BoundedExecutor(max_concurrency=4, per_host_limit=4, timeout=120, label="indicators")
+    try:
+        async with WriteBehindWriter(save_to_postgres, label="indicators") as writer:
+            await executor.run([
+                (name, "www.alphavantage.co", lambda n=name, f=function: ingest_indicator(n, f, writer))
+                for name, function in INDICATORS.items()
+            ])
+    finally:
+        await close_session()
 
 if __name__ == "__main__":
+    run_migrations()
     asyncio.run(main())
@@ -0,0 +1,212 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from embedding_pipeline import embed_in_batches
+
+load_dotenv()
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "cache/embeddings")
+# Per model; ~3 KB per 768-d vector, so the default stays under ~1.5 GB
+EMBEDDING_CACHE_MAX_VECTORS = int(os.getenv("EMBEDDING_CACHE_MAX_VECTORS", "500000"))
+GEMINI_EMBEDDING_MODEL = "models/text-embedding-004"
+
+
+def content_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Vectors live in one append-only float32 file per model ({model}.f32, read
+    through np.memmap); a SQLite index maps (model, content hash) to a row in that
+    file plus a last-used time. When a model exceeds max_vectors the file is
+    compacted down to the most recently used 90%.
+    """
+
+    def __init__(self, directory=EMBEDDING_CACHE_DIR, max_vectors=EMBEDDING_CACHE_MAX_VECTORS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_vectors = max_vectors
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                dim INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+        """)
+        self._db.commit()
+
+    def _path(self, model):
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model) + ".f32")
+
+    def get_many(self, model, keys):
+        """Cached vectors for the given keys, as {key: np.ndarray}."""
+        if not keys:
+            return {}
+        with self._lock:
+            rows = []
+            unique = list(set(keys))
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                rows.extend(self._db.execute(
+                    f"SELECT key, row, dim FROM vectors WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall())
+            if not rows:
+                return {}
+
+            dim = rows[0][2]
+            matrix = np.memmap(self._path(model), dtype=np.float32, mode="r").reshape(-1, dim)
+            found = {key: np.array(matrix[row]) for key, row, _ in rows}
+
+            now = time.time()
+            self._db.executemany("UPDATE vectors SET last_used = ? WHERE model = ? AND key = ?",
+                                 [(now, model, key) for key in found])
+            self._db.commit()
+            return found
+
+    def put_many(self, model, keys, vectors):
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        dim = matrix.shape[1]
+        path = self._path(model)
+
+        with self._lock:
+            start = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+            with open(path, "ab") as f:
+                f.write(matrix.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            now = time.time()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO vectors (model, key, row, dim, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(model, key, start + i, dim, now) for i, key in enumerate(keys)]
+            )
+            self._db.commit()
+
+            count = self._db.execute("SELECT COUNT(*) FROM vectors WHERE model = ?", (model,)).fetchone()[0]
+            if start + len(keys) > self.max_vectors or count > self.max_vectors:
+                self._compact(model, dim)
+
+    def _compact(self, model, dim):
+        """Rewrite the model's file keeping only the most recently used entries (LRU)."""
+        keep = int(self.max_vectors * 0.9)
+        rows = self._db.execute(
+            "SELECT key, row FROM vectors WHERE model = ? ORDER BY last_used DESC LIMIT ?", (model, keep)
+        ).fetchall()
+
+        path = self._path(model)
+        old = np.memmap(path, dtype=np.float32, mode="r").reshape(-1, dim)
+        new = old[[row for _, row in rows]] if rows else np.empty((0, dim), dtype=np.float32)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(np.ascontiguousarray(new).tobytes())
+        del old
+
+        self._db.execute("DELETE FROM vectors WHERE model = ?", (model,))
+        self._db.executemany(
+            "INSERT INTO vectors (model, key, row, dim, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(model, key, i, dim, time.time()) for i, (key, _) in enumerate(rows)]
+        )
+        os.replace(f"{path}.tmp", path)
+        self._db.commit()
+        print(f"🧹 Embedding cache compacted to {len(rows)} vectors for {model}.")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(directory=EMBEDDING_CACHE_DIR):
+    """One store per directory per process, so concurrent builders share its lock."""
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = EmbeddingStore(directory)
+        return _stores[directory]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document vectors from the persistent cache,
+    keyed by (model name, sha256 of the chunk text), and only sends cache misses
+    to the provider, through the batched pipeline. Every finished batch is
+    written to the cache right away, so a failed build resumes where it stopped.
+    Query embeddings are passed straight through. The store is opened on the
+    first document embedding, so constructing the wrapper touches no files.
+    """
+
+    def __init__(self, embeddings, model_name=None, directory=EMBEDDING_CACHE_DIR):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.directory = directory
+
+    @property
+    def store(self):
+        return get_store(self.directory)
+
+    def embed_documents(self, texts):
+        keys = [content_key(t) for t in texts]
+        found = self.store.get_many(self.model_name, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            missing_keys = list(missing)
+
+            def checkpoint(offset, vectors):
+                self.store.put_many(self.model_name, missing_keys[offset:offset + len(vectors)], vectors)
+
+            vectors = embed_in_batches(self.embeddings, list(missing.values()), on_batch=checkpoint)
+            found.update(zip(missing_keys, np.asarray(vectors, dtype=np.float32)))
+
+        print(f"🧠 Embeddings: {len(texts) - len(missing)} cached, {len(missing)} embedded.")
+        return [found[key].tolist() for key in keys]
+
+    def seed(self, texts, vectors):
+        """Cache vectors already computed elsewhere (e.g. stored in an index) for texts not cached yet."""
+        keys = [content_key(t) for t in texts]
+        found = self.store.get_many(self.model_name, keys)
+        new = {}
+        for key, vector in zip(keys, vectors):
+            if key not in found:
+                new.setdefault(key, vector)
+        if new:
+            self.store.put_many(self.model_name, list(new), np.stack(list(new.values())))
+        return len(new)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+_gemini = None
+_gemini_lock = threading.Lock()
+
+
+def gemini_embeddings():
+    """
+    The process-wide Gemini embedding model behind the cache: document vectors
+    are served from disk and only new chunk texts go to the API. Every index
+    builder and the combined query share it.
+    """
+    global _gemini
+    with _gemini_lock:
+        if _gemini is None:
+            _gemini = CachedEmbeddings(GoogleGenerativeAIEmbeddings(model=GEMINI_EMBEDDING_MODEL))
+        return _gemini
@@ -0,0 +1,69 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt, wait_exponential
+from http_client import TokenBucket
+
+load_dotenv()
+
+# Gemini batchEmbedContents accepts up to 100 texts per request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "1500"))
+
+embedding_limiter = TokenBucket(EMBED_REQUESTS_PER_MINUTE, capacity=EMBED_CONCURRENCY)
+
+
+@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=2, max=30), reraise=True)
+def _embed_batch(embeddings, texts, limiter):
+    limiter.acquire_blocking()
+    return embeddings.embed_documents(texts)
+
+
+def embed_in_batches(embeddings, texts, on_batch=None, batch_size=EMBED_BATCH_SIZE,
+                     concurrency=EMBED_CONCURRENCY, limiter=embedding_limiter, label="embeddings"):
+    """
+    Embed `texts` in provider-sized batches on a thread pool, paced by the shared
+    token bucket; each batch is retried with backoff. `on_batch(offset, vectors)`
+    is called as every batch completes (in completion order), so callers can
+    checkpoint finished work; a batch that still fails after its retries does not
+    stop the others, and the first such error is raised once all have finished.
+    Returns the vectors in input order.
+    """
+    if not texts:
+        return []
+
+    batches = [(i, texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+    report_every = max(1, len(batches) // 10)
+    started = time.perf_counter()
+    done = 0
+    error = None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+        futures = {
+            pool.submit(_embed_batch, embeddings, batch, limiter): n
+            for n, (_, batch) in enumerate(batches)
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            n = futures[future]
+            offset, batch = batches[n]
+            try:
+                vectors = future.result()
+            except Exception as e:
+                print(f"[{label}] ❌ Batch of {len(batch)} chunks at offset {offset} failed: {e}")
+                error = error or e
+                continue
+            results[n] = vectors
+            if on_batch is not None:
+                on_batch(offset, vectors)
+
+            done += len(batch)
+            if completed % report_every == 0 or completed == len(batches):
+                elapsed = time.perf_counter() - started
+                print(f"[{label}] 🧮 {done}/{len(texts)} chunks embedded ({done / elapsed:.1f} chunks/sec)")
+
+    if error is not None:
+        raise error
+    return [vector for vectors in results for vector in vectors]
@@ -8,63 +8,66 @@ Created on Sun Apr 20 08:59:28 2025
 import os
 import pandas as pd
 from database import postgres_engine
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from index_maintenance import sync_index, source_watermark
+from index_registry import get_index
+from embedding_cache import gemini_embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 
 # Set environment
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+embeddings = gemini_embeddings()
 splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
 
+FINANCIAL_INDEX_PATH = "faiss_financial_index"
+# Restatements upsert in place, so the sum catches changed figures as well as new rows
+FINANCIAL_SIGNATURE_SQL = (
+    "SELECT COUNT(*), MAX(fiscal_date), "
+    "SUM(COALESCE(total_revenue, 0) + COALESCE(net_income, 0) + COALESCE(gross_profit, 0) + COALESCE(operating_income, 0)) "
+    "FROM financial_reports"
+)
+FINANCIAL_RECORDS_VERSION = 2
+
 # Step 1: Load structured financial report data
 def load_structured_reports():
     query = "SELECT * FROM financial_reports"
     df = pd.read_sql(query, postgres_engine)
     return df
 
-# Step 2: Turn rows into paragraphs
+# Step 2: Turn rows into paragraphs (column-wise string concatenation, one "Label: value" line per column)
 def convert_to_text(df):
-    text_blocks = []
-    for _, row in df.iterrows():
-        block = f"Company: {row.get('symbol')}\n"
-        for col in df.columns:
-            if col != "symbol":
-                val = row[col]
-                block += f"{col.replace('_', ' ').title()}: {val}\n"
-        text_blocks.append(block.strip())
-    return text_blocks
-
-# Step 3 & 4: Chunk and embed
-def build_financial_faiss_index():
+    blocks = "Company: " + df["symbol"].astype(str) + "\n"
+    for col in df.columns:
+        if col != "symbol":
+            blocks = blocks + f"{col.replace('_', ' ').title()}: " + df[col].astype(str) + "\n"
+    return blocks.str.strip().tolist()
+
+# Step 3 & 4: Chunk and embed (only new or restated reports, keyed by symbol:fiscal_date)
+def build_financial_faiss_index(watermark=None):
+    watermark = watermark or source_watermark(FINANCIAL_SIGNATURE_SQL)
     df = load_structured_reports()
     if df.empty:
         print("⚠️ No financial reports found in the database.")
         return
 
     paragraphs = convert_to_text(df)
-    chunks = []
-    metadata = []
+    records = []
 
-    for i, p in enumerate(paragraphs):
+    for p, symbol, fiscal_date in zip(paragraphs, df["symbol"], df["fiscal_date"]):
         splits = splitter.split_text(p)
-        chunks.extend(splits)
-        symbol = df.iloc[i].get("symbol", "Unknown")
-        metadata.extend([{"source": f"report:{symbol}"}] * len(splits))
+        metadata = {"source": f"report:{symbol}", "symbol": symbol, "date": str(fiscal_date)}
+        records.append((f"{symbol}:{fiscal_date}", splits, [metadata] * len(splits)))
 
-    vector_store = FAISS.from_texts(chunks, embeddings, metadatas=metadata)
-    vector_store.save_local("faiss_financial_index")
-    print("✅ FAISS index with financial reports saved.")
+    sync_index(FINANCIAL_INDEX_PATH, records, embeddings, watermark=watermark,
+               records_version=FINANCIAL_RECORDS_VERSION, label="financial index")
 
 def run_financial_query(question: str):
     from langchain_google_genai import ChatGoogleGenerativeAI
-    from langchain_community.vectorstores import FAISS
     from langchain.chains.combine_documents import create_stuff_documents_chain
     from langchain.chains import create_retrieval_chain
     from langchain_core.prompts import ChatPromptTemplate
 
-    # Load FAISS financial report index
-    vector_store = FAISS.load_local("faiss_financial_index", embeddings, allow_dangerous_deserialization=True)
+    # Warm FAISS financial report index (shared across calls, reloaded when rebuilt)
+    vector_store = get_index(FINANCIAL_INDEX_PATH, embeddings)
     retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 5})
     llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
 
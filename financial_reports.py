@@ -6,74 +6,72 @@ Created on Fri Apr 18 23:25:08 2025
 """
 
 import os
-import aiohttp
 import asyncio
 import pandas as pd
 from dotenv import load_dotenv
-from models import FinancialReport
-from database import postgres_engine
-from sqlalchemy import Table, Column, Float, String, Date, Integer, MetaData, text
+from validation import validate_financial_reports
+from http_client import fetch_alpha_vantage, close_session
+from concurrency_utils import BoundedExecutor
+from write_behind import WriteBehindWriter
+from bulk_loader import copy_dataframe
+from schema import financial_table
+from migrations import run_migrations
 from datetime import datetime
 
 load_dotenv()
 API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 
-metadata = MetaData()
-
-financial_table = Table("financial_reports", metadata,
-    Column("symbol", String),
-    Column("fiscal_date", Date),
-    Column("total_revenue", Float),
-    Column("net_income", Float),
-    Column("gross_profit", Float),
-    Column("operating_income", Float),
-)
-
-metadata.create_all(postgres_engine)
-
 async def fetch_financials(symbol):
-    url = "https://www.alphavantage.co/query"
     params = {
         "function": "INCOME_STATEMENT",
         "symbol": symbol,
         "apikey": API_KEY
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            data = await resp.json()
-            return data.get("quarterlyReports", [])
+    data = await fetch_alpha_vantage(params)
+    return data.get("quarterlyReports", [])
 
 def parse_financials(raw_reports, symbol):
-    cleaned = []
-    for report in raw_reports:
-        try:
-            row = {
-                "symbol": symbol,
-                "fiscal_date": report["fiscalDateEnding"],
-                "total_revenue": float(report.get("totalRevenue") or 0),
-                "net_income": float(report.get("netIncome") or 0),
-                "gross_profit": float(report.get("grossProfit") or 0),
-                "operating_income": float(report.get("operatingIncome") or 0),
-            }
-            validated = FinancialReport(**row)
-            cleaned.append(validated.dict())
-        except Exception as e:
-            print(f"[{symbol}] Skipped row: {e}")
+    raw = pd.DataFrame(raw_reports).reindex(
+        columns=["fiscalDateEnding", "totalRevenue", "netIncome", "grossProfit", "operatingIncome"]
+    )
+    df = pd.DataFrame({
+        "symbol": symbol,
+        "fiscal_date": raw["fiscalDateEnding"],
+        "total_revenue": raw["totalRevenue"],
+        "net_income": raw["netIncome"],
+        "gross_profit": raw["grossProfit"],
+        "operating_income": raw["operatingIncome"],
+    })
+    cleaned, _ = validate_financial_reports(df, symbol)
     return cleaned
 
 def save_financials_to_postgres(data):
-    if data:
-        with postgres_engine.begin() as conn:
-            conn.execute(financial_table.insert(), data)
-        print(f"✅ Saved {len(data)} financial rows to PostgreSQL.")
+    if data is not None and not data.empty:
+        # Restated quarters overwrite the stored row instead of duplicating it
+        written = copy_dataframe(data, financial_table, conflict_columns=["symbol", "fiscal_date"], on_conflict="update")
+        print(f"✅ Saved {written} financial rows to PostgreSQL.")
+        return written
+    return 0
 
 async def main():
     symbols = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "JPM", "BAC", "WFC", "GS", "MS", "XOM", "CVX", "BP", "COP", "UNH", "JNJ", "PFE", "MRK", "LLY"]
-    for symbol in symbols:
+
+    async def ingest(symbol, writer):
         raw = await fetch_financials(symbol)
         parsed = parse_financials(raw, symbol)
-        save_financials_to_postgres(parsed)
+        await writer.submit(parsed)
+        return parsed
+
+    executor = BoundedExecutor(max_concurrency=8, per_host_limit=4, timeout=120, label="financials")
+    try:
+        async with WriteBehindWriter(save_financials_to_postgres, label="financials") as writer:
+            await executor.run([
+                (symbol, "www.alphavantage.co", lambda s=symbol: ingest(s, writer)) for symbol in symbols
+            ])
+    finally:
+        await close_session()
 
 if __name__ == "__main__":
+    run_migrations()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import aiohttp
+from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from response_cache import response_cache
+
+load_dotenv()
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# Alpha Vantage plan quota (requests per minute). Free keys get 5/min, premium plans 75+.
+ALPHA_VANTAGE_REQUESTS_PER_MINUTE = float(os.getenv("ALPHA_VANTAGE_REQUESTS_PER_MINUTE", "5"))
+ALPHA_VANTAGE_BURST = int(os.getenv("ALPHA_VANTAGE_BURST", "1"))
+
+# Connection pool sizing for the shared session
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+
+# Alpha Vantage answers quota/plan problems with HTTP 200 and one of these keys; never cache those
+NON_CACHEABLE_KEYS = {"Note", "Information", "Error Message"}
+
+
+class TokenBucket:
+    """
+    Process-wide token bucket. Callers reserve a token under a thread lock and
+    sleep off any deficit, so concurrent callers are spaced at the refill rate
+    instead of bursting into the provider's quota.
+    """
+
+    def __init__(self, rate_per_minute, capacity=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_blocking(self):
+        """Same as acquire, for worker threads outside the event loop."""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+alpha_vantage_limiter = TokenBucket(ALPHA_VANTAGE_REQUESTS_PER_MINUTE, ALPHA_VANTAGE_BURST)
+
+_session = None
+_session_loop = None
+
+
+def get_session():
+    """Return the shared pooled session, creating it on the running event loop if needed."""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+        )
+        _session_loop = loop
+    return _session
+
+
+async def close_session():
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+def _is_cacheable(result):
+    return not (isinstance(result, dict) and NON_CACHEABLE_KEYS & result.keys())
+
+
+async def _raise_for_status(resp):
+    if resp.status == 429:
+        raise aiohttp.ClientError("Rate limit hit. Retrying...")
+    elif 400 <= resp.status < 500:
+        # Bad request / plan limits: retrying will not help
+        raise RuntimeError(f"API error {resp.status}: {await resp.text()}")
+    elif resp.status != 200:
+        raise aiohttp.ClientError(f"API error: {resp.status}")
+
+
+@retry(
+    retry=retry_if_exception_type(aiohttp.ClientError),
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, min=2, max=30)
+)
+async def fetch_json(url, params, headers=None, limiter=None):
+    cached = response_cache.get(url, params)
+    if cached is not None:
+        return json.loads(cached)
+
+    if limiter is not None:
+        await limiter.acquire()
+
+    session = get_session()
+    async with session.get(url, params=params, headers=headers) as resp:
+        await _raise_for_status(resp)
+        payload = await resp.read()
+
+    result = json.loads(payload)
+    if _is_cacheable(result):
+        response_cache.put(url, params, payload)
+    return result
+
+
+@retry(
+    retry=retry_if_exception_type(aiohttp.ClientError),
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, min=2, max=30)
+)
+async def fetch_decoded(url, params, decoder_factory, headers=None, limiter=None, chunk_size=64 * 1024):
+    """Stream the response body into a fresh incremental decoder and return decoder.finish()."""
+    decoder = decoder_factory()
+
+    cached = response_cache.open(url, params)
+    if cached is not None:
+        with cached:
+            for chunk in iter(lambda: cached.read(chunk_size), b""):
+                decoder.feed(chunk)
+        return decoder.finish()
+
+    if limiter is not None:
+        await limiter.acquire()
+
+    # The body is compressed into the cache as it streams, so it is never held in memory whole
+    entry = response_cache.open_entry(url, params)
+    try:
+        session = get_session()
+        async with session.get(url, params=params, headers=headers) as resp:
+            await _raise_for_status(resp)
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                decoder.feed(chunk)
+                if entry is not None:
+                    entry.write(chunk)
+        result = decoder.finish()
+    except BaseException:
+        if entry is not None:
+            entry.discard()
+        raise
+
+    if entry is not None:
+        if _is_cacheable(result):
+            entry.commit()
+        else:
+            entry.discard()
+    return result
+
+
+async def fetch_alpha_vantage(params):
+    """GET an Alpha Vantage endpoint through the shared session and the global quota limiter."""
+    return await fetch_json(ALPHA_VANTAGE_URL, params, limiter=alpha_vantage_limiter)
+
+
+async def fetch_alpha_vantage_decoded(params, decoder_factory):
+    return await fetch_decoded(ALPHA_VANTAGE_URL, params, decoder_factory, limiter=alpha_vantage_limiter)
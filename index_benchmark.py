@@ -0,0 +1,62 @@
+import sys
+import time
+import faiss
+import numpy as np
+from vector_store import load_vector_store
+from index_factory import INDEX_TYPES, make_index
+
+
+def load_vectors(index_path):
+    """Stored vectors of an index directory (exact for flat and SQ/IVF-Flat, approximate for PQ)."""
+    index = load_vector_store(index_path, None, writable=True).index
+    if faiss.try_extract_index_ivf(index) is not None:
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def make_vectors(n, d=768, n_clusters=100, seed=0):
+    # Clustered like real embeddings, so IVF partitioning has structure to exploit
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, d)).astype(np.float32)
+    return centers[rng.integers(0, n_clusters, n)] + 0.3 * rng.normal(size=(n, d)).astype(np.float32)
+
+
+def run_benchmark(vectors, k=10, n_queries=200, seed=1):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    rng = np.random.default_rng(seed)
+    # Held-out style queries: stored vectors with a little noise
+    queries = vectors[rng.choice(n, min(n_queries, n), replace=False)]
+    queries = queries + 0.05 * queries.std() * rng.normal(size=queries.shape).astype(np.float32)
+
+    print(f"📊 {n:,} vectors x {d} dims, {len(queries)} queries, recall@{k} against the flat index\n")
+    print(f"{'type':<10} {'build':>8} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} {'bytes/vec':>10}")
+
+    truth = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = make_index(vectors, index_type)
+        build = time.perf_counter() - start
+
+        # Single-query latency, as served by the RAG retrievers
+        latencies, results = [], []
+        for q in queries:
+            start = time.perf_counter()
+            _, ids = index.search(q[None, :], k)
+            latencies.append(time.perf_counter() - start)
+            results.append(ids[0])
+        results = np.array(results)
+        if truth is None:
+            truth = results
+
+        recall = np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)])
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        size = len(faiss.serialize_index(index)) / n
+        print(f"{index_type:<10} {build:7.2f}s {recall:8.3f} {p50:8.3f} {p99:8.3f} {size:10,.0f}")
+
+
+if __name__ == "__main__":
+    # Usage: python index_benchmark.py <index_dir | n_synthetic_vectors> [k] [n_queries]
+    source = sys.argv[1] if len(sys.argv) > 1 else "20000"
+    vectors = make_vectors(int(source)) if source.isdigit() else load_vectors(source)
+    run_benchmark(vectors, *[int(a) for a in sys.argv[2:4]])
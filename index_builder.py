@@ -5,20 +5,53 @@ Created on Sun Apr 20 19:59:52 2025
 @author: PCA
 """
 
-import os
-from rag_utils import build_faiss_index_gemini
-from financial_indexing_utils import build_financial_faiss_index
-from economic_indexing_utils import build_economic_faiss_index
-from price_indexing_utils import build_price_faiss_index
-from rag_utils import load_and_chunk_news
-
-def initialize_all_indexes():
-    load_and_chunk_news()
-    if not os.path.exists("faiss_gemini_index/index.faiss"):
-        build_faiss_index_gemini()
-    if not os.path.exists("faiss_financial_index/index.faiss"):
-        build_financial_faiss_index()
-    if not os.path.exists("faiss_econ_index/index.faiss"):
-        build_economic_faiss_index()
-    if not os.path.exists("faiss_price_index/index.faiss"):
-        build_price_faiss_index()
\ No newline at end of file
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from index_maintenance import source_watermark, is_fresh
+from rag_utils import build_faiss_index_gemini, NEWS_INDEX_PATH, NEWS_SIGNATURE_SQL, NEWS_RECORDS_VERSION
+from financial_indexing_utils import (build_financial_faiss_index, FINANCIAL_INDEX_PATH, FINANCIAL_SIGNATURE_SQL,
+                                      FINANCIAL_RECORDS_VERSION)
+from economic_indexing_utils import build_economic_faiss_index, ECON_INDEX_PATH, ECON_SIGNATURE_SQL, ECON_RECORDS_VERSION
+from price_indexing_utils import build_price_faiss_index, PRICE_INDEX_PATH, PRICE_SIGNATURE_SQL, PRICE_RECORDS_VERSION
+
+# (name, index path, source signature query, records version, builder)
+INDEXES = [
+    ("news", NEWS_INDEX_PATH, NEWS_SIGNATURE_SQL, NEWS_RECORDS_VERSION, build_faiss_index_gemini),
+    ("financial", FINANCIAL_INDEX_PATH, FINANCIAL_SIGNATURE_SQL, FINANCIAL_RECORDS_VERSION, build_financial_faiss_index),
+    ("econ", ECON_INDEX_PATH, ECON_SIGNATURE_SQL, ECON_RECORDS_VERSION, build_economic_faiss_index),
+    ("price", PRICE_INDEX_PATH, PRICE_SIGNATURE_SQL, PRICE_RECORDS_VERSION, build_price_faiss_index),
+]
+
+def _timed_build(name, build, watermark):
+    started = time.perf_counter()
+    build(watermark)
+    return time.perf_counter() - started
+
+def initialize_all_indexes(max_workers=4):
+    """
+    Compare each index's manifest watermark with one aggregate query on its source
+    table (and its index type and records version with the current code) and only
+    load/chunk/embed the stale ones, concurrently.
+    """
+    started = time.perf_counter()
+    stale = []
+    for name, path, signature_sql, records_version, build in INDEXES:
+        watermark = source_watermark(signature_sql)
+        if is_fresh(path, watermark, records_version):
+            print(f"[{name}] ✅ Index is fresh, skipping.")
+        else:
+            stale.append((name, build, watermark))
+
+    if not stale:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-build") as pool:
+        futures = {pool.submit(_timed_build, name, build, watermark): name for name, build, watermark in stale}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                print(f"[{name}] ⏱ Index built in {future.result():.1f}s")
+            except Exception as e:
+                print(f"[{name}] ❌ Index build failed: {e}")
+
+    print(f"🏁 {len(stale)} index(es) refreshed in {time.perf_counter() - started:.1f}s")
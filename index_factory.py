@@ -0,0 +1,107 @@
+import os
+import math
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+load_dotenv()
+
+# faiss index_factory descriptions; {nlist} and {m} are sized from the data at build time
+INDEX_TYPES = {
+    "flat": "Flat",
+    "ivf_flat": "IVF{nlist},Flat",
+    "hnsw": "HNSW32,Flat",
+    # 4-bit fast-scan PQ: 16 centroids per sub-quantizer train ~40x faster than 8-bit PQ
+    "ivf_pq": "IVF{nlist},PQ{m}x4fs",
+    "sq8": "SQ8",
+    "ivf_sq8": "IVF{nlist},SQ8",
+}
+
+# Per-index choice, e.g. VECTOR_INDEX_TYPES="faiss_gemini_index=ivf_flat,faiss_price_index=hnsw"
+VECTOR_INDEX_TYPES = dict(
+    item.split("=", 1) for item in os.getenv("VECTOR_INDEX_TYPES", "").replace(" ", "").split(",") if "=" in item
+)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+TRAIN_SAMPLE_SIZE = int(os.getenv("TRAIN_SAMPLE_SIZE", "50000"))
+
+# k-means wants ~39 points per centroid
+MIN_POINTS_PER_LIST = 39
+PQ_MIN_TRAIN = 16 * MIN_POINTS_PER_LIST
+
+
+def index_type_for(index_path):
+    index_type = VECTOR_INDEX_TYPES.get(os.path.basename(os.path.normpath(index_path)), "flat")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r} for {index_path}; choose from {sorted(INDEX_TYPES)}")
+    return index_type
+
+
+def supports_remove(index_type):
+    # Only flat compacts positions on remove_ids the way the LangChain id mapping assumes
+    return index_type == "flat"
+
+
+def stores_exact_vectors(index_type):
+    # Quantized types (PQ, SQ8) only reconstruct approximations of the embeddings
+    return index_type in ("flat", "ivf_flat", "hnsw")
+
+
+def describe(index_type, n, d):
+    """faiss factory string for `n` vectors of dimension `d`, or None when n is too small to train."""
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_LIST))
+    # Two dimensions per sub-quantizer, fast-scan needs m even. At 4 bits per code a 768-d vector
+    # is 384 sub-quantizers = 192 bytes of codes; IVF lists, centroids and fast-scan block padding
+    # add to that on disk (index_benchmark.py reports the total bytes per vector)
+    m = d // 2 if d % 2 == 0 else d
+    if "IVF" in INDEX_TYPES[index_type] and n < MIN_POINTS_PER_LIST:
+        return None
+    if "PQ" in INDEX_TYPES[index_type] and n < PQ_MIN_TRAIN:
+        return None
+    return INDEX_TYPES[index_type].format(nlist=nlist, m=m)
+
+
+def make_index(vectors, index_type="flat", metric=faiss.METRIC_L2, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH, seed=0):
+    """
+    Build and populate a faiss index of the given type. Quantizers are trained on
+    a random sample of at most TRAIN_SAMPLE_SIZE vectors; too few vectors to
+    train falls back to an exact flat index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    spec = describe(index_type, n, d)
+    if spec is None:
+        print(f"ℹ️ {n} vectors are too few to train {index_type}; using a flat index.")
+        spec = "Flat"
+
+    index = faiss.index_factory(d, spec, metric)
+    if not index.is_trained:
+        sample = vectors
+        if n > TRAIN_SAMPLE_SIZE:
+            sample = vectors[np.random.default_rng(seed).choice(n, TRAIN_SAMPLE_SIZE, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+
+    if "IVF" in spec:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    if spec.startswith("HNSW"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def build_store(embeddings, ids, texts, metadatas, index_type="flat"):
+    """
+    LangChain FAISS store over a freshly built index of `index_type`. Vectors
+    come from `embeddings` (the embedding cache, so rebuilding known chunks does
+    not call the provider).
+    """
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = make_index(vectors, index_type)
+    docstore = InMemoryDocstore({
+        doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
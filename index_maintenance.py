@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import faiss
+from collections import defaultdict
+from sqlalchemy import text
+from database import postgres_engine
+from vector_store import load_vector_store, save_vector_store, index_exists, is_current_format
+from index_factory import index_type_for, supports_remove, stores_exact_vectors, build_store
+from embedding_cache import CachedEmbeddings
+
+MANIFEST_NAME = "manifest.json"
+# Bump when the meaning of manifest records changes; older manifests are re-adopted from the index
+MANIFEST_FORMAT = 2
+
+
+def load_manifest(index_path):
+    try:
+        with open(os.path.join(index_path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": 0, "watermark": None, "records": {}}
+
+
+def source_watermark(signature_sql, engine=postgres_engine):
+    """Cheap signature of an index's source rows (counts, max dates, sums) from one aggregate query."""
+    with engine.connect() as conn:
+        row = conn.execute(text(signature_sql)).one()
+    return [None if value is None else str(value) for value in row]
+
+
+def is_fresh(index_path, watermark, records_version=1):
+    """
+    True when the index was built from this source snapshot, with the configured
+    index type, by the current record-building code and in the current layout.
+    """
+    manifest = load_manifest(index_path)
+    return (is_current_format(index_path)
+            and manifest.get("format", 1) == MANIFEST_FORMAT
+            and manifest["watermark"] == watermark
+            and manifest.get("index_type", "flat") == index_type_for(index_path)
+            and manifest.get("records_version", 1) == records_version)
+
+
+def _save_manifest(index_path, manifest):
+    path = os.path.join(index_path, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, default=str)
+    os.replace(f"{path}.tmp", path)
+
+
+def record_hash(chunks, metadatas):
+    raw = json.dumps([chunks, metadatas], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _adopt_existing(vector_store, records):
+    """
+    Index without a (current) manifest: claim stored chunks for each record by
+    exact text match. The hash is taken from the stored documents, so a record
+    whose metadata differs from what is stored is re-added (its vectors come
+    from the embedding cache) instead of being trusted as unchanged.
+    """
+    by_text = defaultdict(list)
+    stored = {}
+    for doc_id in vector_store.index_to_docstore_id.values():
+        stored[doc_id] = vector_store.docstore.search(doc_id)
+        by_text[stored[doc_id].page_content].append(doc_id)
+
+    adopted = {}
+    for key, chunks, metadatas in records:
+        if key in adopted or not all(by_text.get(c) for c in chunks):
+            continue
+        ids = [by_text[c].pop() for c in chunks]
+        adopted[key] = {"hash": record_hash(chunks, [stored[i].metadata for i in ids]), "ids": ids}
+    return adopted
+
+
+def _seed_embedding_cache(vector_store, embeddings, index_type, batch_size=50000):
+    """
+    Copy an adopted index's stored vectors into the embedding cache. Indexes built
+    before the cache existed would otherwise send every chunk that is re-added
+    (or packed into a prompt) back to the embedding API.
+    """
+    if not isinstance(embeddings, CachedEmbeddings) or not stores_exact_vectors(index_type):
+        return 0
+    index = vector_store.index
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    seeded = 0
+    for start in range(0, index.ntotal, batch_size):
+        vectors = index.reconstruct_n(start, min(batch_size, index.ntotal - start))
+        texts = [vector_store.docstore.search(vector_store.index_to_docstore_id[start + i]).page_content
+                 for i in range(len(vectors))]
+        seeded += embeddings.seed(texts, vectors)
+    return seeded
+
+
+def sync_index(index_path, records, embeddings, watermark=None, records_version=1, label="index"):
+    """
+    Bring a FAISS index in line with its source rows.
+
+    `records` is a list of (key, chunks, metadatas), one per source row, with a
+    stable key (e.g. "AAPL:2024-03-31"). The manifest next to the index maps each
+    key to a content hash and the docstore ids of its chunks: unchanged records
+    are skipped, new or changed ones are embedded and added, and chunks of
+    changed or vanished records are deleted by id.
+
+    The faiss index type comes from VECTOR_INDEX_TYPES (see index_factory). Types
+    that cannot delete in place (IVF, HNSW, quantized) are rebuilt from the
+    surviving chunks when something is removed, as is any index whose type
+    changed; their vectors come from the embedding cache.
+
+    `records_version` identifies the code that turned rows into records (each
+    builder passes its *_RECORDS_VERSION constant); bump it when chunking,
+    filtering or metadata changes, so is_fresh() stops trusting the watermark and
+    indexes built by older code are re-synced.
+    """
+    manifest = load_manifest(index_path)
+    index_type = index_type_for(index_path)
+    vector_store = None
+    adopted = False
+    outdated = False
+    if index_exists(index_path):
+        outdated = not is_current_format(index_path)
+        vector_store = load_vector_store(index_path, embeddings, writable=True)
+        if manifest.get("format", 1) != MANIFEST_FORMAT:
+            # Records adopted by older code may carry hashes that do not describe the stored chunks
+            manifest["records"] = {}
+        if not manifest["records"]:
+            manifest["records"] = _adopt_existing(vector_store, records)
+            adopted = True
+            seeded = _seed_embedding_cache(vector_store, embeddings, manifest.get("index_type", "flat"))
+            print(f"[{label}] 🔗 Adopted {len(manifest['records'])} records from the existing index "
+                  f"({seeded} vectors added to the embedding cache).")
+
+    previous = manifest["records"]
+    current = {}
+    texts, metadatas, ids = [], [], []
+
+    for key, chunks, chunk_metadatas in records:
+        if key in current:
+            continue
+        digest = record_hash(chunks, chunk_metadatas)
+        entry = previous.get(key)
+        if entry is not None and entry["hash"] == digest:
+            current[key] = entry
+            continue
+
+        chunk_ids = [f"{key}#{digest[:8]}#{i}" for i in range(len(chunks))]
+        current[key] = {"hash": digest, "ids": chunk_ids}
+        texts.extend(chunks)
+        metadatas.extend(chunk_metadatas)
+        ids.extend(chunk_ids)
+
+    stale = []
+    if vector_store is not None:
+        live = set(vector_store.index_to_docstore_id.values())
+        keep = {doc_id for entry in current.values() for doc_id in entry["ids"]}
+        stale = list(live - keep)
+    retyped = vector_store is not None and manifest.get("index_type", "flat") != index_type
+
+    # An older on-disk layout is written out again even when no record changed
+    if not texts and not stale and not retyped and not outdated and vector_store is not None:
+        print(f"[{label}] ✅ Index up to date ({len(current)} records).")
+        if adopted or manifest["watermark"] != watermark or manifest.get("records_version", 1) != records_version:
+            _save_manifest(index_path, {**manifest, "watermark": watermark, "records": current,
+                                        "records_version": records_version, "format": MANIFEST_FORMAT})
+        return vector_store
+
+    if vector_store is None or retyped or (stale and not supports_remove(index_type)):
+        kept_ids = [] if vector_store is None else [
+            doc_id for doc_id in vector_store.index_to_docstore_id.values() if doc_id in keep
+        ]
+        kept = [vector_store.docstore.search(doc_id) for doc_id in kept_ids]
+        vector_store = None
+        if kept or texts:
+            vector_store = build_store(embeddings, kept_ids + ids, [d.page_content for d in kept] + texts,
+                                       [d.metadata for d in kept] + metadatas, index_type)
+    else:
+        if stale:
+            vector_store.delete(stale)
+        if texts:
+            vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+
+    if vector_store is None:
+        print(f"[{label}] ⚠️ Nothing to index.")
+        return None
+
+    save_vector_store(vector_store, index_path)
+    _save_manifest(index_path, {
+        "version": manifest["version"] + 1,
+        "watermark": watermark,
+        "records": current,
+        "index_type": index_type,
+        "records_version": records_version,
+        "format": MANIFEST_FORMAT,
+    })
+    print(f"[{label}] 🔄 Index refreshed: +{len(texts)} chunks, -{len(stale)} chunks, {len(current)} records.")
+    return vector_store
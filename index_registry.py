@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import defaultdict
+from index_maintenance import MANIFEST_NAME, load_manifest
+from vector_store import DOCS_FILE, load_vector_store
+
+# One read-only store per index directory for the whole process, shared by all
+# requests and threads. Queries keep the store object they were handed, so a
+# hot swap never disturbs a search already running against the old one (its
+# mmap and SQLite handle stay valid after the files are replaced).
+_entries = {}
+_load_locks = defaultdict(threading.Lock)
+_lock = threading.Lock()
+
+
+def _stamp(index_path):
+    """
+    On-disk identity of an index from two stat calls (docs.sqlite is swapped last
+    on save); the manifest itself is only parsed on reload.
+    """
+    stamp = []
+    for name in (DOCS_FILE, MANIFEST_NAME):
+        try:
+            stamp.append(os.stat(os.path.join(index_path, name)).st_mtime_ns)
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def get_index(index_path, embeddings):
+    """
+    Warm read-only store for `index_path`, loaded on first use and reloaded
+    when the directory's version changes. While one thread reloads, the
+    others keep being served the previous version instead of waiting.
+    `embeddings` is only used when a path is (re)loaded.
+    """
+    key = os.path.abspath(index_path)
+    entry = _entries.get(key)
+    if entry is not None and entry[1] == _stamp(key):
+        return entry[0]
+
+    with _lock:
+        load_lock = _load_locks[key]
+    if entry is not None:
+        if not load_lock.acquire(blocking=False):
+            return entry[0]
+    else:
+        load_lock.acquire()
+
+    try:
+        # Another thread may have finished loading while this one waited
+        stamp = _stamp(key)
+        current = _entries.get(key)
+        if current is not None and current[1] == stamp:
+            return current[0]
+        version = load_manifest(key)["version"]
+        vector_store = load_vector_store(key, embeddings)
+        _entries[key] = (vector_store, stamp, version)
+        if current is not None:
+            print(f"♻️ Reloaded {index_path} (version {version}).")
+        return vector_store
+    finally:
+        load_lock.release()
+
+
+def index_version(index_path):
+    """Manifest version of the index as currently served (0 if not loaded)."""
+    entry = _entries.get(os.path.abspath(index_path))
+    return entry[2] if entry is not None else 0
+
+
+def clear():
+    _entries.clear()
@@ -18,11 +18,13 @@ from query_parameter_extractor import extract_parameters_with_gemini
 from multi_index_rag import run_combined_rag_query
 from langchain_google_genai import ChatGoogleGenerativeAI
 from index_builder import initialize_all_indexes
+from migrations import run_migrations
 
 if __name__ == "__main__":
     try:
         validate_api_key()
         enforce_rate_limit()
+        run_migrations()
         initialize_all_indexes()
 
         question = "What are the average returns and volatility levels for Alphabet in 2024?"
@@ -33,7 +35,7 @@ if __name__ == "__main__":
         start_date = params.get("start_date")
         end_date = params.get("end_date")
 
-        rag_summary = run_combined_rag_query(question)
+        rag_summary = run_combined_rag_query(question, symbol=symbol, start_date=start_date, end_date=end_date)
         llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
         executive_summary = generate_executive_summary_with_llm(llm, rag_summary, symbol, start_date, end_date)
         risk_analysis = generate_risk_analysis_with_llm(llm, rag_summary, symbol)
@@ -0,0 +1,152 @@
+import sys
+import pandas as pd
+from sqlalchemy import text
+from database import postgres_engine
+from schema import metadata
+
+# Serialises concurrent runners (app container + ingestion jobs) on the same database
+MIGRATION_LOCK_ID = 7_340_101
+
+
+def _create_tables(conn):
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _has_primary_key(conn, table):
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) AND contype = 'p')"
+    ), {"t": table}).scalar()
+
+
+def _add_composite_key(conn, table, columns, index_name):
+    """Clean up rows that would violate the key, then promote a unique index to the primary key."""
+    if _has_primary_key(conn, table):
+        return
+
+    cols = ", ".join(columns)
+    conn.execute(text(f"DELETE FROM {table} WHERE " + " OR ".join(f"{c} IS NULL" for c in columns)))
+    conn.execute(text(f"""
+        DELETE FROM {table} a
+        USING {table} b
+        WHERE a.ctid < b.ctid AND {" AND ".join(f"a.{c} = b.{c}" for c in columns)}
+    """))
+    for c in columns:
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {c} SET NOT NULL"))
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} ({cols})"))
+    conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {index_name}"))
+
+
+def _stock_prices_key(conn):
+    _add_composite_key(conn, "stock_prices", ["symbol", "date"], "uq_stock_prices_symbol_date")
+
+
+def _financial_reports_key(conn):
+    _add_composite_key(conn, "financial_reports", ["symbol", "fiscal_date"], "uq_financial_reports_symbol_fiscal_date")
+
+
+def _economic_indicators_key(conn):
+    _add_composite_key(conn, "economic_indicators", ["indicator", "date"], "uq_economic_indicators_indicator_date")
+
+
+def _news_dedup_keys(conn):
+    """Backfill url_key/content_hash on existing rows, drop duplicates and add the unique indexes."""
+    from news_feed import add_dedup_keys
+
+    conn.execute(text("ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS url_key VARCHAR"))
+    conn.execute(text("ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS content_hash VARCHAR"))
+
+    missing = pd.read_sql(text(
+        "SELECT ctid::text AS row_id, url, title, description FROM news_articles "
+        "WHERE url_key IS NULL OR content_hash IS NULL"
+    ), conn)
+    if not missing.empty:
+        keyed = add_dedup_keys(missing)
+        conn.execute(
+            text("UPDATE news_articles SET url_key = :url_key, content_hash = :content_hash "
+                 "WHERE ctid = CAST(:row_id AS tid)"),
+            keyed[["row_id", "url_key", "content_hash"]].to_dict(orient="records")
+        )
+
+    for key in ("url_key", "content_hash"):
+        conn.execute(text(f"""
+            DELETE FROM news_articles a
+            USING news_articles b
+            WHERE a.ctid > b.ctid AND a.{key} = b.{key}
+        """))
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_news_articles_{key} ON news_articles ({key})"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_news_articles_published_at ON news_articles (published_at)"))
+
+
+# Applied in order, each in its own transaction; never edit or renumber an applied entry
+MIGRATIONS = [
+    (1, "create base tables", _create_tables),
+    (2, "stock_prices primary key (symbol, date)", _stock_prices_key),
+    (3, "news_articles url/content dedup keys", _news_dedup_keys),
+    (4, "financial_reports primary key (symbol, fiscal_date)", _financial_reports_key),
+    (5, "economic_indicators primary key (indicator, date)", _economic_indicators_key),
+]
+
+
+def run_migrations(engine=postgres_engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+
+    for version, description, step in MIGRATIONS:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            applied = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": version}
+            ).first()
+            if applied:
+                continue
+            print(f"🛠 Applying migration {version}: {description}")
+            step(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                {"v": version, "d": description}
+            )
+
+
+def partition_stock_prices(partitions, engine=postgres_engine):
+    """
+    Optional: rebuild stock_prices as a hash-partitioned table on symbol, so each
+    per-symbol read touches a single partition. Idempotent.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        already = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = CAST('stock_prices' AS regclass))"
+        )).scalar()
+        if already:
+            print("ℹ️ stock_prices is already partitioned.")
+            return
+
+        conn.execute(text(
+            "CREATE TABLE stock_prices_partitioned (LIKE stock_prices INCLUDING DEFAULTS) PARTITION BY HASH (symbol)"
+        ))
+        conn.execute(text(
+            "ALTER TABLE stock_prices_partitioned ADD CONSTRAINT stock_prices_partitioned_pkey PRIMARY KEY (symbol, date)"
+        ))
+        for i in range(partitions):
+            conn.execute(text(
+                f"CREATE TABLE stock_prices_p{i} PARTITION OF stock_prices_partitioned "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+            ))
+        conn.execute(text("INSERT INTO stock_prices_partitioned SELECT * FROM stock_prices"))
+        conn.execute(text("DROP TABLE stock_prices"))
+        conn.execute(text("ALTER TABLE stock_prices_partitioned RENAME TO stock_prices"))
+        conn.execute(text("ALTER TABLE stock_prices RENAME CONSTRAINT stock_prices_partitioned_pkey TO stock_prices_pkey"))
+        print(f"✅ stock_prices partitioned by symbol into {partitions} hash partitions.")
+
+
+if __name__ == "__main__":
+    # Usage: python migrations.py [--partition-stock-prices N]
+    run_migrations()
+    if "--partition-stock-prices" in sys.argv:
+        partition_stock_prices(int(sys.argv[sys.argv.index("--partition-stock-prices") + 1]))
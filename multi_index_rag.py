@@ -6,8 +6,17 @@ Created on Sun Apr 20 09:04:38 2025
 """
 
 import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_community.vectorstores import FAISS
+import re
+import time
+import faiss
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from langchain_google_genai import ChatGoogleGenerativeAI
+from vector_store import filtered_search, lexical_search
+from index_registry import get_index, index_version
+from answer_cache import get_answer_cache
+from context_packing import pack_context
+from embedding_cache import gemini_embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains.combine_documents import create_stuff_documents_chain
@@ -27,7 +36,7 @@ class StaticMultiRetriever(BaseRetriever):
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Embeddings + LLM
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+embeddings = gemini_embeddings()
 llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
 
 # Prompt Template
@@ -46,34 +55,185 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-# Main function: search both vector stores and combine chunks
-def run_combined_rag_query(question: str, k=10):
+# (name, path) of every index searched by the combined query
+RAG_INDEXES = [
+    ("news", "faiss_gemini_index"),
+    ("financial", "faiss_financial_index"),
+    ("econ", "faiss_econ_index"),
+    ("price", "faiss_price_index"),
+]
+# faiss releases the GIL while searching, so plain threads run the searches in parallel
+_search_pool = ThreadPoolExecutor(max_workers=len(RAG_INDEXES), thread_name_prefix="index-search")
+
+
+# Reciprocal rank fusion constant: dense and BM25 ranks are fused as sum(1 / (RRF_K + rank))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Lookup-style questions (an indexed ticker plus a period or figure label) try BM25 alone first
+TICKER = re.compile(r"\b[A-Z]{2,5}\b")
+PERIOD_OR_FIGURE = re.compile(
+    r"\b(Q[1-4]|(19|20)\d{2}(-\d{2}){0,2}|net income|total revenue|revenue|gross profit|operating income|eps)\b",
+    re.IGNORECASE,
+)
+LEXICAL_MAX_WORDS = 12
+LEXICAL_MIN_HITS = 3
+
+
+def similarity(index, distance):
+    # Embeddings are unit length, so squared L2 = 2 - 2*cos; both metrics map onto cosine
+    return distance if index.metric_type == faiss.METRIC_INNER_PRODUCT else 1 - distance / 2
+
+
+def known_symbols():
+    """Symbols present in the docs.sqlite symbol column of any RAG index."""
+    symbols = set()
+    for _, path in RAG_INDEXES:
+        try:
+            docstore = get_index(path, embeddings).docstore
+            symbols.update(row[0] for row in docstore.query("SELECT DISTINCT symbol FROM docs WHERE symbol IS NOT NULL"))
+        except Exception:
+            pass
+    return symbols
+
+
+def lexical_ticker(question):
+    """
+    The indexed ticker of a short lookup question ("MSFT net income Q3 2024"),
+    or None. Capitalised acronyms that are not indexed symbols (US, CPI, AI)
+    do not count.
+    """
+    if len(question.split()) > LEXICAL_MAX_WORDS or PERIOD_OR_FIGURE.search(question) is None:
+        return None
+    candidates = set(TICKER.findall(question))
+    if not candidates:
+        return None
+    matches = candidates & known_symbols()
+    return matches.pop() if len(matches) == 1 else None
+
+
+def fuse(rankings, k):
+    """Top-k Documents by reciprocal rank fusion of per-retriever rankings (best first)."""
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1 / (HYBRID_RRF_K + rank + 1)
+            docs.setdefault(doc.id, doc)
+    return [docs[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+def index_versions():
+    """Manifest version of each RAG index as served by the registry (0 when unavailable)."""
+    versions = []
+    for _, path in RAG_INDEXES:
+        try:
+            get_index(path, embeddings)  # picks up a rebuilt index before its version is read
+        except Exception:
+            pass
+        versions.append(index_version(path))
+    return versions
+
+
+def retrieve(question: str, k=10, symbol=None, start_date=None, end_date=None, embedding=None, lexical_only=False):
+    """
+    Hybrid search of every index in parallel: the dense top-k (one query
+    embedding shared by all indexes) and the BM25 top-k from the same chunks
+    are fused by reciprocal rank, which picks each index's k chunks. Each
+    chunk is scored by its cosine similarity to the question (BM25-only
+    finds from their cached chunk vectors), so indexes merge and pack on one
+    scale. lexical_only skips the embedding call and scores by BM25 relative
+    to the best hit of any index. Returns (Document, score, index name)
+    triples, best first; an index that fails to load or search is skipped
+    with a warning.
+    """
+    started = time.perf_counter()
+    vector = None
+    if not lexical_only:
+        vector = embedding if embedding is not None else embeddings.embed_query(question)
+    embedded = time.perf_counter()
+    filters = dict(symbol=symbol, start_date=start_date, end_date=end_date)
+
+    def search(path):
+        vector_store = get_index(path, embeddings)
+        lexical = lexical_search(vector_store, question, k=k, **filters)
+        if vector is None:
+            return lexical
+        dense = filtered_search(vector_store, question, k=k, embedding=vector, **filters)
+        scores = {doc.id: similarity(vector_store.index, distance) for doc, distance in dense}
+        docs = fuse([[doc for doc, _ in dense], [doc for doc, _ in lexical]], k)
+        unscored = [doc for doc in docs if doc.id not in scores]
+        if unscored:
+            chunk_vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in unscored]),
+                                       dtype=np.float32)
+            chunk_vectors /= np.maximum(np.linalg.norm(chunk_vectors, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(vector, dtype=np.float32)
+            query = query / max(np.linalg.norm(query), 1e-12)
+            scores.update(zip([doc.id for doc in unscored], (chunk_vectors @ query).tolist()))
+        return [(doc, scores[doc.id]) for doc in docs]
+
+    futures = [(name, _search_pool.submit(search, path)) for name, path in RAG_INDEXES]
+    results = []
+    for name, future in futures:
+        try:
+            results.extend((doc, score, name) for doc, score in future.result())
+        except Exception as e:
+            print(f"⚠️ Search of the {name} index failed: {e}")
+    if lexical_only and results:
+        # BM25 scales differ per query; relative to the best hit they fall in 0-1 like cosine scores
+        best = max(max(score for _, score, _ in results), 1e-12)
+        results = [(doc, score / best, name) for doc, score, name in results]
+    results.sort(key=lambda hit: hit[1], reverse=True)
+
+    finished = time.perf_counter()
+    mode = "lexical" if lexical_only else "hybrid"
+    print(f"🔎 Retrieved {len(results)} chunks ({mode}, symbol={symbol}, {start_date} to {end_date}): "
+          f"embed {(embedded - started) * 1000:.0f}ms, search {(finished - embedded) * 1000:.0f}ms.")
+    return results
+
+
+def generate_answer(question, hits):
+    # MMR-packed into the token budget so near-identical chunks do not crowd the prompt
+    all_docs = pack_context(hits, embeddings)
+
+    # Wrap in a static retriever
+    retriever = StaticMultiRetriever(documents=all_docs)
+
+    # Create chain
+    qa_chain = create_stuff_documents_chain(llm, prompt)
+    chain = create_retrieval_chain(retriever, qa_chain)
+
+    # Run
+    result = chain.invoke({"input": question})
+    return result.get("answer")
+
+
+# Main function: search all vector stores and combine chunks
+# symbol/start_date/end_date (from extract_parameters_with_gemini) restrict each index to
+# matching chunks before vector scoring; undated or symbol-less chunks are kept
+def run_combined_rag_query(question: str, k=10, symbol=None, start_date=None, end_date=None):
     try:
-        # Load both indexes
-        news_index = FAISS.load_local("faiss_gemini_index", embeddings, allow_dangerous_deserialization=True)
-        fin_index = FAISS.load_local("faiss_financial_index", embeddings, allow_dangerous_deserialization=True)
-        econ_index = FAISS.load_local("faiss_econ_index", embeddings, allow_dangerous_deserialization=True)
-        price_index = FAISS.load_local("faiss_price_index", embeddings, allow_dangerous_deserialization=True)
-
-        # Get top-k results from each
-        news_docs = news_index.similarity_search(question, k=k)
-        fin_docs = fin_index.similarity_search(question, k=k)
-        econ_docs = econ_index.similarity_search(question, k=k)
-        price_docs = price_index.similarity_search(question, k=k)
-
-        # Combine documents
-        all_docs = news_docs + fin_docs + econ_docs + price_docs
-        
-        # Wrap in a static retriever
-        retriever = StaticMultiRetriever(documents=all_docs)
-
-        # Create chain
-        qa_chain = create_stuff_documents_chain(llm, prompt)
-        chain = create_retrieval_chain(retriever, qa_chain)
-
-        # Run
-        result = chain.invoke({"input": question})
-        return result.get("answer", "⚠️ No response.")
+        # Ticker/figure lookups ("MSFT net income Q3 2024") are answered from BM25 alone when its best
+        # hits all belong to that ticker: no embedding call (and no semantic answer cache, which is keyed by it)
+        ticker = lexical_ticker(question)
+        if ticker is not None and (symbol is None or symbol.upper() == ticker):
+            hits = retrieve(question, k=k, symbol=ticker, start_date=start_date, end_date=end_date, lexical_only=True)
+            top = hits[:LEXICAL_MIN_HITS]
+            if len(top) == LEXICAL_MIN_HITS and all(
+                    (doc.metadata.get("symbol") or "").upper() == ticker for doc, _, _ in top):
+                return generate_answer(question, hits) or "⚠️ No response."
+
+        # Paraphrases of an already answered question (same scope, same index data) skip retrieval and the LLM
+        vector = embeddings.embed_query(question)
+        versions = index_versions()
+        cached = get_answer_cache().get(vector, symbol, start_date, end_date, versions)
+        if cached is not None:
+            return cached
+
+        # Top-k from each index (warm stores from the registry), merged best first
+        hits = retrieve(question, k=k, symbol=symbol, start_date=start_date, end_date=end_date, embedding=vector)
+        answer = generate_answer(question, hits)
+        if not answer:
+            return "⚠️ No response."
+        get_answer_cache().put(question, vector, symbol, start_date, end_date, versions, answer)
+        return answer
 
     except Exception as e:
         return f"❌ Error during combined RAG query: {e}"
@@ -6,72 +6,83 @@ Created on Mon Apr 14 20:49:42 2025
 """
 
 import os
-import aiohttp
+import re
+import math
+import hashlib
 import asyncio
 import pandas as pd
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from database import postgres_engine
-from sqlalchemy import Table, Column, String, Text, DateTime, MetaData
-from models import NewsArticle  # pydantic model to validate
+from http_client import fetch_json, close_session
+from bulk_loader import copy_dataframe
+from write_behind import WriteBehindWriter
+from schema import news_table
+from migrations import run_migrations
+from validation import enforce_utf8, validate_news_articles
 
 load_dotenv()
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 NEWS_API_URL = "https://newsapi.org/v2/everything"
 
-metadata = MetaData()
+# Pagination: NewsAPI allows up to 100 articles per page
+NEWS_PAGE_SIZE = 100
+NEWS_MAX_PAGES = int(os.getenv("NEWS_MAX_PAGES", "5"))
+NEWS_PAGE_CONCURRENCY = int(os.getenv("NEWS_PAGE_CONCURRENCY", "3"))
 
-news_table = Table("news_articles", metadata,
-    Column("title", String),
-    Column("description", Text),
-    Column("content", Text),
-    Column("published_at", DateTime),
-    Column("source", String),
-    Column("url", String),
-    Column("topic", String),
-)
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid|mc_cid|mc_eid|cmpid|ref|src|soc_src|soc_trk|taid)$", re.IGNORECASE)
 
-metadata.create_all(postgres_engine)
-
-@retry(
-    retry=retry_if_exception_type(aiohttp.ClientError),
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=2, max=30)
-)
+# Keys already seen in this process, shared by all concurrently running topic fetches
+_seen_url_keys = set()
+_seen_content_hashes = set()
 
+def normalize_url(url):
+    """Canonical form of an article URL: lower-case host, no fragment, tracking params or trailing slash."""
+    if not isinstance(url, str):
+        return None
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower().removeprefix("www."), path, query, ""))
+
+def content_hash(title, description):
+    """Hash of the normalised headline + description; syndicated copies share it under different URLs."""
+    normalized = " ".join(f"{title or ''} {description or ''}".lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def add_dedup_keys(df):
+    df = df.copy()
+    df["url_key"] = df["url"].map(normalize_url)
+    df["content_hash"] = [content_hash(t, d) for t, d in zip(df["title"], df["description"])]
+    return df
 
-def enforce_utf8(df):
-    for col in df.select_dtypes(include=["object"]).columns:
-        df[col] = df[col].astype(str).apply(
-            lambda x: x.encode("utf-8", errors="replace").decode("utf-8", errors="ignore")
-        )
+def drop_seen_articles(df, label):
+    """Drop in-batch duplicates and anything already seen in this run (by URL or content)."""
+    before = len(df)
+    df = df.drop_duplicates(subset=["url_key"]).drop_duplicates(subset=["content_hash"])
+    df = df[~df["url_key"].isin(_seen_url_keys) & ~df["content_hash"].isin(_seen_content_hashes)]
+    _seen_url_keys.update(df["url_key"].dropna())
+    _seen_content_hashes.update(df["content_hash"])
+    if len(df) < before:
+        print(f"[{label}] 🧹 Dropped {before - len(df)} duplicate articles.")
     return df
 
 def save_news_to_postgres(df):
     if df is not None and not df.empty:
-        df = enforce_utf8(df)
+        df = enforce_utf8(df.copy())
 
-        # Ensure datetime format is compatible
-        df["published_at"] = pd.to_datetime(df["published_at"], errors="coerce")
-        df = df.dropna(subset=["published_at"])
-        df["published_at"] = df["published_at"].apply(lambda x: x.isoformat() if pd.notnull(x) else None)
-        
-        valid_docs = []
-        for row in df.to_dict(orient="records"):
-            try:
-                article = NewsArticle(**row)  # use pydantic to validate
-                valid_docs.append(article.dict())
-            except Exception as e:
-                print(f"Skipping row due to validation error: {e}")
-
-        if valid_docs:
-            with postgres_engine.begin() as conn:
-                conn.execute(news_table.insert(), valid_docs)
-                print(f"✅ Saved {len(valid_docs)} news articles to PostgreSQL.")
-
-async def fetch_news(session, query, page=1):
-    from datetime import datetime, timedelta
+        # ✅ Columnar validation (same rules as models.NewsArticle), dates normalised to ISO
+        valid_docs, _ = validate_news_articles(df)
+        valid_docs = valid_docs.assign(url_key=df["url_key"], content_hash=df["content_hash"])
+
+        if not valid_docs.empty:
+            # Unique indexes on url_key / content_hash skip articles already in the table
+            inserted = copy_dataframe(valid_docs, news_table, on_conflict="ignore")
+            print(f"✅ Saved {inserted} new news articles to PostgreSQL ({len(valid_docs) - inserted} already stored).")
+            return inserted
+    return 0
+
+async def fetch_news(query, page=1):
     today = datetime.utcnow().date()
     hundred_days_ago = today - timedelta(days=30)
 
@@ -80,7 +91,7 @@ async def fetch_news(session, query, page=1):
         "language": "en",
         "sortBy": "publishedAt",
         "apiKey": NEWS_API_KEY,
-        "pageSize": 20,
+        "pageSize": NEWS_PAGE_SIZE,
         "page": page,
         "from": hundred_days_ago.isoformat(),
         "to": today.isoformat()
@@ -91,13 +102,31 @@ async def fetch_news(session, query, page=1):
         "Accept": "application/json"
     }
 
-    async with session.get(NEWS_API_URL, params=params, headers=headers) as resp:
-        if resp.status == 429:
-            raise aiohttp.ClientError("Rate limit hit. Retrying...")
-        elif resp.status != 200:
-            print(await resp.text())  # for debugging
-            raise aiohttp.ClientError(f"NewsAPI error: {resp.status}")
-        return await resp.json()
+    # Shared session with retry/backoff and the on-disk response cache
+    return await fetch_json(NEWS_API_URL, params, headers=headers)
+
+async def fetch_all_pages(topic):
+    """Fetch page 1, then the remaining pages concurrently within a bounded window."""
+    first = await fetch_news(topic, page=1)
+    articles = list(first.get("articles", []))
+
+    total = first.get("totalResults", 0)
+    pages = min(math.ceil(total / NEWS_PAGE_SIZE), NEWS_MAX_PAGES)
+    window = asyncio.Semaphore(NEWS_PAGE_CONCURRENCY)
+
+    async def fetch_page(page):
+        async with window:
+            return await fetch_news(topic, page=page)
+
+    results = await asyncio.gather(*[fetch_page(p) for p in range(2, pages + 1)], return_exceptions=True)
+    for page, result in zip(range(2, pages + 1), results):
+        if isinstance(result, Exception):
+            print(f"[{topic}] ⚠️ Page {page} skipped: {result}")
+            continue
+        articles.extend(result.get("articles", []))
+
+    print(f"[{topic}] 📄 Fetched {len(articles)} articles from {pages or 1} page(s).")
+    return {**first, "articles": articles}
 
 def parse_news(json_data, topic):
     if "articles" not in json_data:
@@ -118,28 +147,39 @@ def parse_news(json_data, topic):
             "topic": topic
         })
 
-    return pd.DataFrame(data)
-
-async def fetch_news_for_topic(topic):
-    async with aiohttp.ClientSession() as session:
-        try:
-            raw = await fetch_news(session, topic)
-            df = parse_news(raw, topic)
+    if not data:
+        return None
+    return add_dedup_keys(pd.DataFrame(data))
+
+async def fetch_news_for_topic(topic, writer=None):
+    try:
+        raw = await fetch_all_pages(topic)
+        df = parse_news(raw, topic)
+        if df is not None:
+            df = drop_seen_articles(df, topic)
             print(df)
-            if df is not None:
-                print(df[["title", "published_at"]].head())
+            print(df[["title", "published_at"]].head())
+            if writer is not None:
+                await writer.submit(df)  # ✅ Stored behind by the DB thread
+            else:
                 save_news_to_postgres(df)  # ✅ Store after fetching
-            return df
-        except Exception as e:
-            print(f"[{topic}] Error: {e}")
-            return None
+        return df
+    except Exception as e:
+        print(f"[{topic}] Error: {e}")
+        return None
 
 if __name__ == "__main__":
     topics = ["stock market", "inflation", "Federal Reserve", "Apple", "Microsoft"]
 
+    run_migrations()
+
     async def main():
-        tasks = [fetch_news_for_topic(topic) for topic in topics]
-        results = await asyncio.gather(*tasks)
+        try:
+            async with WriteBehindWriter(save_news_to_postgres, label="news") as writer:
+                tasks = [fetch_news_for_topic(topic, writer) for topic in topics]
+                results = await asyncio.gather(*tasks)
+        finally:
+            await close_session()
 
         # Combine all news into one DataFrame
         valid_frames = [r for r in results if r is not None and not r.empty]
@@ -0,0 +1,142 @@
+import os
+import re
+import hashlib
+import numpy as np
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+from langdetect import DetectorFactory, LangDetectException, detect
+
+load_dotenv()
+
+# Languages kept for indexing (comma separated ISO 639-1 codes)
+NEWS_LANGUAGES = set(os.getenv("NEWS_LANGUAGES", "en").replace(" ", "").split(","))
+# SimHash fingerprints this many bits apart or less are treated as the same story
+NEAR_DUP_MAX_BITS = int(os.getenv("NEWS_NEAR_DUP_MAX_BITS", "6"))
+# Too little text for langdetect to be reliable; such articles are kept
+MIN_LANGDETECT_CHARS = 40
+# langdetect's cost grows with length; the opening of an article is enough to classify it
+LANGDETECT_SAMPLE_CHARS = 500
+
+SIMHASH_BITS = 64
+# Word pairs: news blurbs are short, and 3-shingles spread a one-word edit over too many bits
+SHINGLE_SIZE = 2
+# NewsAPI truncates `content` to ~200 chars and appends "… [+1234 chars]"
+TRUNCATION_MARKER = re.compile(r"\s*(?:…|\.\.\.)?\s*\[\+\d+ chars\]\s*$")
+HTML_TAG = re.compile(r"<[^>]+>")
+WORD = re.compile(r"\w+")
+
+DetectorFactory.seed = 0  # langdetect is randomised; fix it so runs agree
+
+
+def _normalize(text):
+    # Word tokens only, so copies differing in case, punctuation or spacing compare equal
+    return " ".join(WORD.findall(text.lower()))
+
+
+def strip_boilerplate(title, description, content):
+    """
+    Article text without NewsAPI boilerplate: the "[+N chars]" truncation marker,
+    HTML tags, and a content field that only repeats the description.
+    """
+    title, description, content = (HTML_TAG.sub(" ", x or "").strip() for x in (title, description, content))
+    content = TRUNCATION_MARKER.sub("", content)
+    norm_desc, norm_content = _normalize(description), _normalize(content)
+    if norm_content and norm_desc and (norm_desc.startswith(norm_content) or norm_content.startswith(norm_desc)):
+        # Keep whichever is longer; the other is a truncated copy of it
+        description, content = (description, "") if len(norm_desc) >= len(norm_content) else ("", content)
+    return "\n\n".join(part for part in (title, description, content) if part)
+
+
+def simhash(text):
+    """64-bit SimHash over word shingles."""
+    words = WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # One row of 64 bits per shingle; each bit votes +1/-1 and the majority sets the fingerprint bit
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), SIMHASH_BITS)
+    votes = 2 * bits.sum(axis=0, dtype=np.int64) > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+class NearDuplicateIndex:
+    """
+    SimHash fingerprints split into max_bits + 1 bands: two fingerprints within
+    max_bits of each other agree on at least one band (pigeonhole), so only
+    fingerprints sharing a band are compared.
+    """
+
+    def __init__(self, max_bits=NEAR_DUP_MAX_BITS):
+        self.max_bits = max_bits
+        self.bands = max_bits + 1
+        self.width = SIMHASH_BITS // self.bands
+        self.buckets = defaultdict(list)
+
+    def _keys(self, fingerprint):
+        mask = (1 << self.width) - 1
+        return [(band, fingerprint >> (band * self.width) & mask) for band in range(self.bands)]
+
+    def add_if_new(self, fingerprint):
+        keys = self._keys(fingerprint)
+        for key in keys:
+            for other in self.buckets[key]:
+                if (fingerprint ^ other).bit_count() <= self.max_bits:
+                    return False
+        for key in keys:
+            self.buckets[key].append(fingerprint)
+        return True
+
+
+def detect_language(text):
+    if len(text) < MIN_LANGDETECT_CHARS:
+        return None
+    try:
+        return detect(text[:LANGDETECT_SAMPLE_CHARS])
+    except LangDetectException:
+        return None
+
+
+def filter_articles(articles, label="news"):
+    """
+    Pre-embedding filter over (key, title, description, content) tuples, in
+    priority order (earlier wins among duplicates). Returns ([(key, text)], report)
+    after boilerplate stripping, exact and SimHash near-duplicate removal and the
+    NEWS_LANGUAGES filter; the report counts what each stage dropped.
+    """
+    report = Counter()
+    seen_hashes = set()
+    near_dups = NearDuplicateIndex()
+    kept = []
+
+    for key, title, description, content in articles:
+        raw_chars = sum(len(x or "") for x in (title, description, content))
+        text = strip_boilerplate(title, description, content)
+        report["articles"] += 1
+        report["boilerplate_chars"] += max(0, raw_chars - len(text))
+
+        if not text:
+            report["empty"] += 1
+            continue
+        digest = hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            report["exact_duplicates"] += 1
+            continue
+        seen_hashes.add(digest)
+        if not near_dups.add_if_new(simhash(text)):
+            report["near_duplicates"] += 1
+            continue
+        language = detect_language(text)
+        if language is not None and language not in NEWS_LANGUAGES:
+            report["other_language"] += 1
+            report[f"lang:{language}"] += 1
+            continue
+        kept.append((key, text))
+
+    report["kept"] = len(kept)
+    languages = ", ".join(f"{k[5:]}={v}" for k, v in report.most_common() if k.startswith("lang:"))
+    print(
+        f"[{label}] 🧹 Filter: {report['articles']} articles -> {report['kept']} kept | "
+        f"exact dups {report['exact_duplicates']}, near dups {report['near_duplicates']}, "
+        f"other language {report['other_language']}{f' ({languages})' if languages else ''}, "
+        f"empty {report['empty']}, boilerplate {report['boilerplate_chars']:,} chars stripped"
+    )
+    return kept, dict(report)
@@ -1,57 +1,71 @@
 import os
+import numpy as np
 import pandas as pd
-from database import postgres_engine
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from price_store import load_prices, refresh_price_store
+from index_maintenance import sync_index, source_watermark
+from embedding_cache import gemini_embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+embeddings = gemini_embeddings()
 splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
 
+PRICE_INDEX_PATH = "faiss_price_index"
+# The latest bar is re-upserted intraday, so include the close sum
+PRICE_SIGNATURE_SQL = "SELECT COUNT(*), MAX(date), SUM(close) FROM stock_prices"
+PRICE_RECORDS_VERSION = 2
+
 def load_stock_data():
-    query = """
-    SELECT symbol, date, close 
-    FROM stock_prices
-    ORDER BY symbol, date
-    """
-    df = pd.read_sql(query, postgres_engine)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
+    return load_prices(columns=("symbol", "date", "close"))
 
 def generate_quarterly_summaries(df):
-    summaries = []
-    metadata = []
+    if df.empty:
+        return [], []
 
-    df['quarter'] = df['date'].dt.to_period('Q')
+    # At most one sort, then the first/last bar of every (symbol, quarter) run is found
+    # from boundaries in the sorted arrays, instead of a groupby loop sorting each group
+    symbols, dates = df["symbol"].to_numpy(), df["date"].to_numpy()
+    in_order = ((symbols[1:] > symbols[:-1]) | ((symbols[1:] == symbols[:-1]) & (dates[1:] >= dates[:-1]))).all()
+    bars = df if in_order else df.sort_values(["symbol", "date"], kind="stable")  # load_prices is already sorted
+    symbols = bars["symbol"].to_numpy()
+    quarters = (bars["date"].dt.year * 4 + (bars["date"].dt.month - 1) // 3).to_numpy()
+    starts = np.r_[True, (symbols[1:] != symbols[:-1]) | (quarters[1:] != quarters[:-1])]
+    ends = np.r_[starts[1:], True]
+    first = bars[starts].reset_index(drop=True)
+    last = bars[ends].reset_index(drop=True)
 
-    for (symbol, quarter), group in df.groupby(['symbol', 'quarter']):
-        group = group.sort_values("date")
-        start_price = group.iloc[0]["close"]
-        end_price = group.iloc[-1]["close"]
-        delta = end_price - start_price
-        trend = "increased" if delta > 0 else "decreased" if delta < 0 else "remained flat"
-        pct = (delta / start_price) * 100 if start_price != 0 else 0
+    start_price = first["close"]
+    end_price = last["close"]
+    delta = end_price - start_price
+    trend = np.select([delta > 0, delta < 0], ["increased", "decreased"], default="remained flat")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = pd.Series(np.where(start_price != 0, delta / start_price * 100, 0.0))
 
-        q_start = group.iloc[0]["date"].date()
-        q_end = group.iloc[-1]["date"].date()
+    q_start = first["date"].dt.date.astype(str)
+    q_end = last["date"].dt.date.astype(str)
+    quarter = first["date"].dt.to_period("Q")
+    date_range = q_start + " to " + q_end
+    fmt = "{:.2f}".format
 
-        summary = (
-            f"{symbol} stock price summary for Q{quarter.quarter} {quarter.year}:\n"
-            f"From {q_start} to {q_end}, closing price {trend} from ${start_price:.2f} to ${end_price:.2f} "
-            f"({pct:.2f}% change)."
-        )
+    summaries = (
+        first["symbol"].astype(str) + " stock price summary for Q" + quarter.dt.quarter.astype(str)
+        + " " + quarter.dt.year.astype(str) + ":\n"
+        + "From " + date_range + ", closing price " + trend
+        + " from $" + start_price.map(fmt) + " to $" + end_price.map(fmt)
+        + " (" + pct.map(fmt) + "% change)."
+    ).tolist()
 
-        summaries.append(summary)
-        metadata.append({
-            "source": "stock_price_summary",
-            "symbol": symbol,
-            "date_range": f"{q_start} to {q_end}"
-        })
+    metadata = [
+        {"source": "stock_price_summary", "symbol": symbol, "quarter": q, "date_range": dr}
+        for symbol, q, dr in zip(first["symbol"], quarter.astype(str), date_range)
+    ]
 
     return summaries, metadata
 
-def build_price_faiss_index():
+def build_price_faiss_index(watermark=None):
+    watermark = watermark or source_watermark(PRICE_SIGNATURE_SQL)
+    # The watermark is read from stock_prices, so the snapshot must be caught up before it is indexed
+    refresh_price_store()
     df = load_stock_data()
     if df.empty:
         print("⚠️ No stock data found.")
@@ -59,14 +73,12 @@ def build_price_faiss_index():
 
     summaries, metadatas = generate_quarterly_summaries(df)
 
-    chunks = []
-    chunk_metadata = []
+    records = []
 
+    # One record per symbol:quarter; usually only the current quarter changes between runs
     for text, meta in zip(summaries, metadatas):
         splits = splitter.split_text(text)
-        chunks.extend(splits)
-        chunk_metadata.extend([meta] * len(splits))
+        records.append((f"{meta['symbol']}:{meta['quarter']}", splits, [meta] * len(splits)))
 
-    vector_store = FAISS.from_texts(chunks, embeddings, metadatas=chunk_metadata)
-    vector_store.save_local("faiss_price_index")
-    print("✅ Quarterly FAISS stock price index saved.")
+    sync_index(PRICE_INDEX_PATH, records, embeddings, watermark=watermark,
+               records_version=PRICE_RECORDS_VERSION, label="price index")
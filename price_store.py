@@ -0,0 +1,159 @@
+import os
+import json
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+from sqlalchemy import text
+from database import postgres_engine
+
+load_dotenv()
+
+# Read-side snapshot of stock_prices: one uncompressed Arrow IPC file per symbol
+# (PRICE_STORE_DIR/symbol=AAPL/prices.arrow), memory-mapped on read so analytics
+# get zero-copy column buffers instead of a DB round trip.
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "cache/price_store")
+MANIFEST_PATH = os.path.join(PRICE_STORE_DIR, "manifest.json")
+
+PRICE_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("volume", pa.int64()),
+])
+
+
+def _symbol_path(symbol):
+    return os.path.join(PRICE_STORE_DIR, f"symbol={symbol}", "prices.arrow")
+
+
+def _read_manifest():
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _write_manifest(manifest):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    _write_atomic(MANIFEST_PATH, write)
+
+
+def _read_table(symbol):
+    """Memory-mapped, zero-copy view of a symbol's bars, or None if it is not in the store."""
+    path = _symbol_path(symbol)
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _write_table(symbol, table):
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, PRICE_SCHEMA) as writer:
+            writer.write_table(table)
+    _write_atomic(_symbol_path(symbol), write)
+
+
+def _query_rows(conn, symbol, since=None):
+    query = "SELECT date, open, high, low, close, volume FROM stock_prices WHERE symbol = :symbol"
+    params = {"symbol": symbol}
+    if since is not None:
+        query += " AND date >= :since"
+        params["since"] = since
+    df = pd.read_sql(text(query + " ORDER BY date"), conn, params=params)
+    df["volume"] = df["volume"].astype("Int64")
+    return pa.Table.from_pandas(df, schema=PRICE_SCHEMA, preserve_index=False)
+
+
+def refresh_price_store(engine=postgres_engine):
+    """
+    Bring the snapshot up to date with stock_prices. Per symbol, only the bars from
+    the stored high-water mark onwards are re-read (the last bar may have been
+    re-upserted); a row-count mismatch means history was rewritten (--full reload),
+    and the symbol is re-read in full.
+    """
+    manifest = _read_manifest()
+    updated = {}
+
+    with engine.connect() as conn:
+        stats = conn.execute(text("SELECT symbol, MAX(date), COUNT(*) FROM stock_prices GROUP BY symbol")).all()
+
+        for symbol, last_date, rows in stats:
+            table = _read_table(symbol) if symbol in manifest else None
+
+            if table is None:
+                merged = _query_rows(conn, symbol)
+            else:
+                since = pa.scalar(pd.Timestamp(manifest[symbol]["last_date"]).date(), pa.date32())
+                tail = _query_rows(conn, symbol, since.as_py())
+                if table.num_rows == rows and table.filter(pc.greater_equal(table["date"], since)).equals(tail):
+                    updated[symbol] = manifest[symbol]
+                    continue
+                merged = pa.concat_tables([table.filter(pc.less(table["date"], since)), tail])
+                if merged.num_rows != rows:
+                    merged = _query_rows(conn, symbol)
+
+            _write_table(symbol, merged)
+            updated[symbol] = {"last_date": last_date.isoformat(), "rows": merged.num_rows}
+            print(f"[{symbol}] 🗂 Price store refreshed: {merged.num_rows} bars through {last_date}.")
+
+    for symbol in set(manifest) - set(updated):
+        shutil.rmtree(os.path.dirname(_symbol_path(symbol)), ignore_errors=True)
+
+    _write_manifest(updated)
+    return updated
+
+
+def load_prices(symbol=None, start_date=None, end_date=None, columns=("date", "close")):
+    """
+    Bars for one symbol (or every symbol in the store or in stock_prices) from the
+    memory-mapped snapshot, sorted by symbol and date, with `date` as datetime64.
+    Symbols missing from the store are read from PostgreSQL.
+    """
+    if symbol:
+        symbols = [symbol]
+    else:
+        with postgres_engine.connect() as conn:
+            listed = conn.execute(text("SELECT DISTINCT symbol FROM stock_prices")).scalars()
+            symbols = sorted(set(_read_manifest()) | set(listed))
+
+    frames = []
+    for sym in symbols:
+        table = _read_table(sym)
+        if table is None:
+            print(f"[{sym}] ℹ️ Not in the price store, reading from PostgreSQL.")
+            with postgres_engine.connect() as conn:
+                table = _query_rows(conn, sym)
+
+        if start_date:
+            table = table.filter(pc.greater_equal(table["date"], pa.scalar(pd.Timestamp(start_date).date(), pa.date32())))
+        if end_date:
+            table = table.filter(pc.less_equal(table["date"], pa.scalar(pd.Timestamp(end_date).date(), pa.date32())))
+
+        df = table.select([c for c in columns if c != "symbol"]).to_pandas()
+        if "symbol" in columns:
+            df["symbol"] = sym
+        frames.append(df[list(columns)])
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(columns))
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+if __name__ == "__main__":
+    refresh_price_store()
@@ -9,8 +9,8 @@ import logging
 from query_parameter_extractor import extract_parameters_with_gemini
 from regression_utils import run_polynomial_regression
 from report_utils import generate_pdf_report
+from multi_index_rag import run_combined_rag_query
 from rag_utils import (
-    run_combined_rag_query,
     generate_executive_summary_with_llm,
     generate_risk_analysis_with_llm,
     generate_methodology_with_llm
@@ -20,12 +20,12 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 def process_query_to_pdf(question: str):
     logging.info(f"📥 Processing query: {question}")
-    rag_summary = run_combined_rag_query(question)
     params = extract_parameters_with_gemini(question)
 
     symbol = params.get("symbol")
     start_date = params.get("start_date")
     end_date = params.get("end_date")
+    rag_summary = run_combined_rag_query(question, symbol=symbol, start_date=start_date, end_date=end_date)
 
     llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
     executive_summary = generate_executive_summary_with_llm(llm, rag_summary, symbol, start_date, end_date)
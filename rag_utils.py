@@ -1,9 +1,12 @@
 import os
 import pandas as pd
 from database import postgres_engine
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from index_maintenance import sync_index, source_watermark
+from index_registry import get_index
+from embedding_cache import gemini_embeddings
+from news_filter import filter_articles
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
@@ -12,9 +15,14 @@ from langchain.chains import create_retrieval_chain
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Embedding + LLM setup
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+embeddings = gemini_embeddings()
 llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
 
+NEWS_INDEX_PATH = "faiss_gemini_index"
+# Articles are insert-only, so row count + latest timestamp identify the indexed snapshot
+NEWS_SIGNATURE_SQL = "SELECT COUNT(*), MAX(published_at) FROM news_articles"
+NEWS_RECORDS_VERSION = 2
+
 # Text splitting config
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
 
@@ -38,35 +46,49 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-# ⬇️ Load news articles and chunk them
-def load_and_chunk_news():
-    query = "SELECT title, description, content, topic FROM news_articles"
+# ⬇️ Load news articles and chunk them, one (url_key, chunks, metadatas) record per article
+# Boilerplate, duplicate/near-duplicate and non-English articles are dropped before embedding
+def load_news_records():
+    query = (
+        "SELECT url_key, content_hash, title, description, content, topic, published_at "
+        "FROM news_articles ORDER BY published_at NULLS LAST, url_key"
+    )
     df = pd.read_sql(query, postgres_engine)
 
-    df["text"] = (
-        df["title"].fillna('') + "\n\n" +
-        df["description"].fillna('') + "\n\n" +
-        df["content"].fillna('')
-    ).str.strip()
+    keys = df["url_key"].mask(df["url_key"].isna() | (df["url_key"] == ""), df["content_hash"])
+    dates = pd.to_datetime(df["published_at"], errors="coerce", utc=True).dt.strftime("%Y-%m-%d")
+    # Earliest copy of a story wins; later syndicated copies are dropped
+    kept, _ = filter_articles(zip(keys, df["title"], df["description"], df["content"]), label="news index")
+    metadata_by_key = {
+        key: {"source": topic} if pd.isna(date) else {"source": topic, "date": date}
+        for key, topic, date in zip(keys, df["topic"], dates)
+    }
 
+    records = []
+    for key, text in kept:
+        chunks = text_splitter.split_text(text)
+        records.append((key, chunks, [metadata_by_key[key]] * len(chunks)))
+
+    return records
+
+def load_and_chunk_news():
     texts, sources = [], []
-    for _, row in df.iterrows():
-        chunks = text_splitter.split_text(row["text"])
+    for _, chunks, metadatas in load_news_records():
         texts.extend(chunks)
-        sources.extend([row["topic"]] * len(chunks))
+        sources.extend(m["source"] for m in metadatas)
 
     return texts, sources
 
-# ⬇️ Build and save FAISS index
-def build_faiss_index_gemini():
-    texts, sources = load_and_chunk_news()
-    vector_store = FAISS.from_texts(texts, embeddings, metadatas=[{"source": src} for src in sources])
-    vector_store.save_local("faiss_gemini_index")
-    print("✅ FAISS index with Gemini saved.")
+# ⬇️ Build or incrementally refresh the FAISS index
+def build_faiss_index_gemini(watermark=None):
+    # Signature taken before loading: rows arriving mid-build just make the next check stale
+    watermark = watermark or source_watermark(NEWS_SIGNATURE_SQL)
+    sync_index(NEWS_INDEX_PATH, load_news_records(), embeddings, watermark=watermark,
+               records_version=NEWS_RECORDS_VERSION, label="news index")
 
 # ⬇️ Load FAISS index and set up retrieval chain
 def load_rag_chain():
-    vector_store = FAISS.load_local("faiss_gemini_index", embeddings, allow_dangerous_deserialization=True)
+    vector_store = get_index(NEWS_INDEX_PATH, embeddings)
     retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 5})
     qa_chain = create_stuff_documents_chain(llm, prompt)
     chain = create_retrieval_chain(retriever, qa_chain)
@@ -5,7 +5,7 @@ import os
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score
-from database import postgres_engine
+from price_store import load_prices
 
 def run_polynomial_regression(symbol, start_date=None, end_date=None, degree=8, output_dir="plots"):
     """
@@ -14,9 +14,8 @@ def run_polynomial_regression(symbol, start_date=None, end_date=None, degree=8,
     """
     os.makedirs(output_dir, exist_ok=True)
 
-    query = f"SELECT date, close FROM stock_prices WHERE symbol = '{symbol}' ORDER BY date ASC"
-    df = pd.read_sql(query, postgres_engine)
-    df["date"] = pd.to_datetime(df["date"])
+    # Memory-mapped snapshot of stock_prices (falls back to PostgreSQL)
+    df = load_prices(symbol)
 
     if df.empty:
         print(f"❌ No data found for {symbol}")
@@ -73,17 +72,10 @@ def run_polynomial_regression(symbol, start_date=None, end_date=None, degree=8,
 
 def compute_technical_indicators(symbol: str, start_date: str, end_date: str):
     """
-    Retrieves stock data from PostgreSQL and computes key technical indicators.
+    Retrieves stock data from the price store and computes key technical indicators.
     Returns a dictionary of calculated metrics.
     """
-    query = f"""
-        SELECT date, close
-        FROM stock_prices
-        WHERE symbol = '{symbol}'
-        AND date BETWEEN '{start_date}' AND '{end_date}'
-        ORDER BY date ASC
-    """
-    df = pd.read_sql(query, postgres_engine)
+    df = load_prices(symbol, start_date, end_date)
 
     if df.empty or "close" not in df.columns:
         print(f"[{symbol}] ⚠️ No data found for computing technical indicators.")
@@ -0,0 +1,160 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# readwrite: serve fresh entries, fetch and store misses
+# replay:    serve only from the cache (any age); a miss raises CacheMissError
+# refresh:   always fetch, store the result
+# off:       bypass the cache entirely
+RESPONSE_CACHE_MODE = os.getenv("RESPONSE_CACHE_MODE", "readwrite")
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "cache/responses")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# TTL per endpoint (Alpha Vantage "function" or NewsAPI path); data changes at most daily
+ENDPOINT_TTLS = {
+    "TIME_SERIES_DAILY": 6 * HOUR,
+    "INCOME_STATEMENT": 7 * DAY,
+    "CPI": DAY,
+    "INFLATION": DAY,
+    "FEDERAL_FUNDS_RATE": DAY,
+    "UNEMPLOYMENT": DAY,
+    "/v2/everything": HOUR,
+}
+DEFAULT_TTL = DAY
+
+# Never part of the key: credentials, and the rolling date window NewsAPI queries are built with
+SECRET_PARAMS = {"apikey", "apiKey"}
+VOLATILE_PARAMS = {"from", "to"}
+
+
+class CacheMissError(RuntimeError):
+    pass
+
+
+def endpoint_name(url, params):
+    return params.get("function") or "/" + url.split("://", 1)[-1].split("/", 1)[-1]
+
+
+class _PendingEntry:
+    """Compresses a streamed body to a temp file; only committed entries become visible."""
+
+    def __init__(self, cache, path):
+        self._cache = cache
+        self._path = path
+        self._tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = gzip.open(self._tmp, "wb", compresslevel=6)
+
+    def write(self, chunk):
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp, self._path)
+        self._cache.evict()
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of raw response bodies, keyed by endpoint URL
+    and request params. Bodies are stored gzip-compressed; the file mtime is the
+    fetch time (TTL) and the atime is bumped on every hit (LRU eviction).
+    """
+
+    def __init__(self, directory=RESPONSE_CACHE_DIR, mode=RESPONSE_CACHE_MODE, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        if mode not in ("readwrite", "replay", "refresh", "off"):
+            raise ValueError(f"Unknown RESPONSE_CACHE_MODE: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+
+    def key(self, url, params):
+        stable = {k: str(v) for k, v in params.items() if k not in SECRET_PARAMS | VOLATILE_PARAMS}
+        raw = json.dumps([url, sorted(stable.items())], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.gz")
+
+    def open(self, url, params):
+        """
+        Readable (decompressing) file for a fresh cached body, or None.
+        In replay mode entries never expire and a miss raises CacheMissError.
+        """
+        if self.mode in ("off", "refresh"):
+            return None
+
+        path = self._path(self.key(url, params))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if self.mode == "replay":
+                raise CacheMissError(f"No cached response for {endpoint_name(url, params)} {params.get('symbol', '')}")
+            return None
+
+        ttl = ENDPOINT_TTLS.get(endpoint_name(url, params), DEFAULT_TTL)
+        if self.mode != "replay" and time.time() - stat.st_mtime > ttl:
+            return None
+
+        os.utime(path, (time.time(), stat.st_mtime))
+        return gzip.open(path, "rb")
+
+    def get(self, url, params):
+        f = self.open(url, params)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def open_entry(self, url, params):
+        """Start writing a streamed body, or None when the mode does not store responses."""
+        if self.mode not in ("readwrite", "refresh"):
+            return None
+        return _PendingEntry(self, self._path(self.key(url, params)))
+
+    def put(self, url, params, payload):
+        entry = self.open_entry(url, params)
+        if entry is not None:
+            entry.write(payload)
+            entry.commit()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries, total = [], 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,52 @@
+from sqlalchemy import (
+    Table, Column, Float, String, Text, Date, DateTime, Integer, MetaData, Index, PrimaryKeyConstraint
+)
+
+# Single definition of the PostgreSQL schema. Nothing here touches the database;
+# DDL is applied by migrations.run_migrations().
+metadata = MetaData()
+
+# Composite keys lead with the entity, so per-symbol/per-indicator reads
+# (WHERE symbol = ... ORDER BY date) are index range scans.
+stock_table = Table("stock_prices", metadata,
+    Column("date", Date, nullable=False),
+    Column("open", Float),
+    Column("high", Float),
+    Column("low", Float),
+    Column("close", Float),
+    Column("volume", Integer),
+    Column("symbol", String, nullable=False),
+    PrimaryKeyConstraint("symbol", "date", name="stock_prices_pkey"),
+)
+
+news_table = Table("news_articles", metadata,
+    Column("title", String),
+    Column("description", Text),
+    Column("content", Text),
+    Column("published_at", DateTime),
+    Column("source", String),
+    Column("url", String),
+    Column("topic", String),
+    Column("url_key", String),
+    Column("content_hash", String),
+    Index("uq_news_articles_url_key", "url_key", unique=True),
+    Index("uq_news_articles_content_hash", "content_hash", unique=True),
+    Index("ix_news_articles_published_at", "published_at"),
+)
+
+financial_table = Table("financial_reports", metadata,
+    Column("symbol", String, nullable=False),
+    Column("fiscal_date", Date, nullable=False),
+    Column("total_revenue", Float),
+    Column("net_income", Float),
+    Column("gross_profit", Float),
+    Column("operating_income", Float),
+    PrimaryKeyConstraint("symbol", "fiscal_date", name="financial_reports_pkey"),
+)
+
+economic_table = Table("economic_indicators", metadata,
+    Column("indicator", String, nullable=False),
+    Column("date", Date, nullable=False),
+    Column("value", Float),
+    PrimaryKeyConstraint("indicator", "date", name="economic_indicators_pkey"),
+)
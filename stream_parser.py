@@ -0,0 +1,109 @@
+import re
+import json
+import numpy as np
+import pandas as pd
+
+SERIES_KEY = b'"Time Series (Daily)"'
+
+# One daily bar: "2024-01-02": {"1. open": "...", ..., "5. volume": "..."}
+BAR_RE = re.compile(
+    rb'"(\d{4}-\d{2}-\d{2})"\s*:\s*\{\s*'
+    rb'"1\. open"\s*:\s*"([^"]*)"\s*,\s*'
+    rb'"2\. high"\s*:\s*"([^"]*)"\s*,\s*'
+    rb'"3\. low"\s*:\s*"([^"]*)"\s*,\s*'
+    rb'"4\. close"\s*:\s*"([^"]*)"\s*,\s*'
+    rb'"5\. volume"\s*:\s*"([^"]*)"\s*\}'
+)
+
+# Error/notice payloads and the "Meta Data" header are tiny; anything bigger is a layout we don't know
+MAX_HEADER_BYTES = 1_000_000
+MAX_PENDING_BYTES = 64 * 1024
+
+
+def _to_float(raw):
+    try:
+        return float(raw)
+    except ValueError:
+        return np.nan
+
+
+class DailySeriesDecoder:
+    """
+    Incremental decoder for TIME_SERIES_DAILY responses.
+
+    Bars are parsed as chunks arrive and written straight into preallocated typed
+    arrays (grown by doubling), so the full JSON document and its dict-of-dicts
+    form are never held in memory. Payloads without a time series (rate-limit
+    notes, error messages) are returned as the decoded JSON dict.
+    """
+
+    def __init__(self, capacity=8192):
+        self._buffer = bytearray()
+        self._in_series = False
+        self._size = 0
+        self._dates = np.empty(capacity, dtype="datetime64[D]")
+        self._prices = np.empty((capacity, 4), dtype=np.float64)
+        self._volume = np.empty(capacity, dtype=np.float64)
+
+    def _grow(self):
+        capacity = len(self._dates) * 2
+        self._dates = np.resize(self._dates, capacity)
+        self._prices = np.resize(self._prices, (capacity, 4))
+        self._volume = np.resize(self._volume, capacity)
+
+    def _append(self, fields):
+        """Convert one chunk's worth of matched bars column-wise into the typed arrays."""
+        start, end = self._size, self._size + len(fields)
+        while end > len(self._dates):
+            self._grow()
+
+        self._dates[start:end] = fields[:, 0].astype("datetime64[D]")
+        numbers = fields[:, 1:]
+        try:
+            values = numbers.astype(np.float64)
+        except ValueError:
+            # Blank or malformed figures become NaN and are rejected later by validation
+            values = np.vectorize(_to_float, otypes=[np.float64])(numbers)
+        self._prices[start:end] = values[:, :4]
+        self._volume[start:end] = values[:, 4]
+        self._size = end
+
+    def feed(self, chunk):
+        self._buffer += chunk
+
+        if not self._in_series:
+            pos = self._buffer.find(SERIES_KEY)
+            if pos < 0:
+                if len(self._buffer) > MAX_HEADER_BYTES:
+                    raise ValueError("No 'Time Series (Daily)' key in the first 1 MB of the response")
+                return
+            self._in_series = True
+            del self._buffer[:pos + len(SERIES_KEY)]
+
+        consumed = 0
+        fields = []
+        for match in BAR_RE.finditer(self._buffer):
+            fields.append(match.groups())
+            consumed = match.end()
+        del self._buffer[:consumed]
+        if fields:
+            self._append(np.array(fields, dtype="S"))
+
+        if len(self._buffer) > MAX_PENDING_BYTES:
+            raise ValueError("Unrecognised TIME_SERIES_DAILY bar layout")
+
+    def finish(self):
+        if not self._in_series:
+            return json.loads(bytes(self._buffer)) if self._buffer.strip() else {}
+
+        n = self._size
+        order = np.argsort(self._dates[:n])[::-1]  # newest first, as the API returns
+        prices = self._prices[:n][order]
+        return pd.DataFrame({
+            "date": self._dates[:n][order],
+            "open": prices[:, 0],
+            "high": prices[:, 1],
+            "low": prices[:, 2],
+            "close": prices[:, 3],
+            "volume": self._volume[:n][order],
+        })
@@ -0,0 +1,130 @@
+import pandas as pd
+
+# Columnar counterparts of the pydantic models in models.py. Each validator evaluates every
+# rule as a boolean mask over the whole frame and returns (valid_rows, rejected_rows).
+
+STOCK_COLUMNS = ["date", "open", "high", "low", "close", "volume", "symbol"]
+NEWS_COLUMNS = ["title", "published_at", "source", "url", "topic", "description", "content"]
+FINANCIAL_COLUMNS = ["symbol", "fiscal_date", "total_revenue", "net_income", "gross_profit", "operating_income"]
+ECONOMIC_COLUMNS = ["indicator", "date", "value"]
+
+_SURROGATES = "[\ud800-\udfff]"
+
+
+def enforce_utf8(df):
+    """Replace unencodable characters (lone surrogates) only in the cells that contain them."""
+    for col in df.select_dtypes(include=["object"]).columns:
+        bad = df[col].str.contains(_SURROGATES, regex=True, na=False)
+        if bad.any():
+            df.loc[bad, col] = df.loc[bad, col].map(
+                lambda x: x.encode("utf-8", errors="replace").decode("utf-8", errors="ignore")
+            )
+    return df
+
+
+def _split_rejections(label, df, checks):
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    for reason, mask in checks.items():
+        reasons = reasons.mask(reasons.isna() & mask, reason)
+
+    rejected_mask = reasons.notna()
+    valid = df[~rejected_mask]
+    rejected = df[rejected_mask].assign(reject_reason=reasons[rejected_mask])
+
+    if not rejected.empty:
+        summary = ", ".join(f"{n} × {reason}" for reason, n in rejected["reject_reason"].value_counts().items())
+        print(f"[{label}] ⚠️ Rejected {len(rejected)} of {len(df)} rows: {summary}")
+
+    return valid, rejected
+
+
+def _is_uppercase(values):
+    values = values.astype(str)
+    uniques = values.unique()
+    upper = [v for v in uniques if v.isupper()]
+    return values.isin(upper)
+
+
+def _to_optional_numeric(values):
+    """Blank -> NaN, numeric text -> float; also returns a mask of non-blank values that failed to parse."""
+    blank = values.isna() | values.astype(str).str.strip().isin(["", "None"])
+    numeric = pd.to_numeric(values.where(~blank), errors="coerce")
+    return numeric, numeric.isna() & ~blank
+
+
+def validate_stock_prices(df, label="stock_prices"):
+    prices = df[["open", "high", "low", "close"]].apply(pd.to_numeric, errors="coerce")
+    volume = pd.to_numeric(df["volume"], errors="coerce")
+    dates = pd.to_datetime(df["date"], errors="coerce")
+
+    checks = {
+        "unparseable date": dates.isna(),
+        "symbol not uppercase": ~_is_uppercase(df["symbol"]),
+        "non-numeric price": prices.isna().any(axis=1),
+        "non-integer volume": volume.isna() | (volume % 1 != 0),
+    }
+    valid, rejected = _split_rejections(label, df, checks)
+
+    valid = valid.assign(
+        date=dates[valid.index].dt.strftime("%Y-%m-%d"),
+        volume=volume[valid.index].astype("int64"),
+        **{col: prices.loc[valid.index, col].astype(float) for col in prices.columns}
+    )
+    return valid[STOCK_COLUMNS], rejected
+
+
+def validate_news_articles(df, label="news"):
+    df = df.reindex(columns=NEWS_COLUMNS)
+    dates = pd.to_datetime(df["published_at"], errors="coerce", utc=True)
+
+    checks = {
+        "missing title": df["title"].isna(),
+        "missing topic": df["topic"].isna(),
+        "unparseable date": dates.isna(),
+        "invalid url": ~df["url"].astype(str).str.startswith("http"),
+    }
+    valid, rejected = _split_rejections(label, df, checks)
+
+    # Stored as UTC wall-clock time in a timestamp-without-time-zone column
+    valid = valid.assign(
+        published_at=dates[valid.index].dt.tz_localize(None).dt.strftime("%Y-%m-%dT%H:%M:%S")
+    )
+    return valid, rejected
+
+
+def validate_financial_reports(df, label="financial_reports"):
+    df = df.reindex(columns=FINANCIAL_COLUMNS)
+    dates = pd.to_datetime(df["fiscal_date"], errors="coerce")
+
+    checks = {"unparseable fiscal date": dates.isna()}
+    figures = {}
+    for col in FINANCIAL_COLUMNS[2:]:
+        numeric, invalid = _to_optional_numeric(df[col])
+        # Missing figures are stored as 0, matching the original ingestion
+        figures[col] = numeric.fillna(0.0)
+        checks[f"non-numeric {col}"] = invalid
+    valid, rejected = _split_rejections(label, df, checks)
+
+    valid = valid.assign(
+        fiscal_date=dates[valid.index].dt.strftime("%Y-%m-%d"),
+        **{col: values[valid.index] for col, values in figures.items()}
+    )
+    return valid, rejected
+
+
+def validate_economic_indicators(df, label="economic_indicators"):
+    df = df.reindex(columns=ECONOMIC_COLUMNS)
+    dates = pd.to_datetime(df["date"], errors="coerce")
+    values, invalid = _to_optional_numeric(df["value"])
+
+    checks = {
+        "unparseable date": dates.isna(),
+        "non-numeric value": invalid,
+    }
+    valid, rejected = _split_rejections(label, df, checks)
+
+    valid = valid.assign(
+        date=dates[valid.index].dt.strftime("%Y-%m-%d"),
+        value=values[valid.index]
+    )
+    return valid, rejected
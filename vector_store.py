@@ -0,0 +1,391 @@
+import os
+import re
+import json
+import glob
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from collections.abc import Mapping
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+# On-disk layout of an index directory:
+#   index-<generation>.faiss – vectors; flat indexes are stored as a single-list
+#                  IVF so the codes can be memory-mapped (IO_FLAG_MMAP) and shared
+#                  through the page cache by every process that opens them
+#   docs.sqlite  – docs(position, id, text, metadata JSON) plus a meta table naming
+#                  the generation and index file it belongs to; symbol/source/
+#                  date_start/date_end are copied out of the metadata into indexed
+#                  side columns for pre-filtered search, and docs_fts is an FTS5
+#                  (BM25) index over the same chunk texts
+# Replacing docs.sqlite is the single switch point between generations. Older
+# layouts (index.faiss, or a pickled index.pkl docstore) are rewritten by the
+# next sync (see is_current_format); the read path never writes.
+LEGACY_INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.sqlite"
+LEGACY_DOCS_FILE = "index.pkl"
+FLAT_AS_IVF = "flat-ivf1"
+LOAD_ATTEMPTS = 3
+SIDE_COLUMNS = ("symbol", "source", "date_start", "date_end")
+FTS_TABLE = "docs_fts"
+WORD = re.compile(r"\w+")
+# Too common in questions to be worth a posting-list scan
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "show", "tell", "that", "the", "to", "was", "were", "what", "when", "which", "with",
+}
+
+
+def _is_flat(index):
+    return isinstance(index, faiss.IndexFlat)
+
+
+def _flat_to_ivf1(index):
+    """Exact flat search expressed as an IVF with one list, whose codes faiss can mmap."""
+    quantizer = faiss.IndexFlat(index.d, index.metric_type)
+    quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+    ivf = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+    ivf.is_trained = True
+    if index.ntotal:
+        ivf.add(index.reconstruct_n(0, index.ntotal))
+    return ivf
+
+
+def _ivf1_to_flat(ivf):
+    invlists = ivf.invlists
+    n = invlists.list_size(0)
+    flat = faiss.IndexFlat(ivf.d, ivf.metric_type)
+    if n:
+        codes = faiss.rev_swig_ptr(invlists.get_codes(0), n * ivf.code_size)
+        ids = faiss.rev_swig_ptr(invlists.get_ids(0), n)
+        vectors = np.frombuffer(codes, dtype=np.float32).reshape(n, ivf.d)[np.argsort(ids)]
+        flat.add(np.ascontiguousarray(vectors))
+    return flat
+
+
+def side_columns(metadata):
+    """(symbol, source, date_start, date_end) of a chunk; date_range is "YYYY-MM-DD to YYYY-MM-DD"."""
+    symbol = metadata.get("symbol")
+    date_start = date_end = metadata.get("date")
+    if metadata.get("date_range"):
+        date_start, _, date_end = str(metadata["date_range"]).partition(" to ")
+    return (
+        str(symbol).upper() if symbol else None,
+        metadata.get("source"),
+        str(date_start)[:10] if date_start else None,
+        str(date_end or date_start)[:10] if date_start else None,
+    )
+
+
+def _create_side_indexes(db):
+    db.execute("CREATE INDEX IF NOT EXISTS docs_symbol_date ON docs (symbol, date_start)")
+    db.execute("CREATE INDEX IF NOT EXISTS docs_source ON docs (source)")
+
+
+def _create_fts(db):
+    # External-content FTS5 table over docs.text, rowid = index position; filled in one pass
+    db.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text, content='docs', content_rowid='position')")
+    db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _filter_sql(symbol=None, sources=None, start_date=None, end_date=None):
+    """
+    WHERE clause over the docs side columns. Chunks without a symbol or date
+    (news, macro indicators) are not excluded by that part of the filter; dated
+    chunks match when their [date_start, date_end] overlaps the range.
+    """
+    clauses, params = [], []
+    if symbol:
+        clauses.append("(docs.symbol IS NULL OR docs.symbol = ?)")
+        params.append(symbol.upper())
+    if sources:
+        clauses.append(f"docs.source IN ({', '.join('?' * len(sources))})")
+        params.extend(sources)
+    if start_date:
+        clauses.append("(docs.date_end IS NULL OR docs.date_end >= ?)")
+        params.append(str(start_date)[:10])
+    if end_date:
+        clauses.append("(docs.date_start IS NULL OR docs.date_start <= ?)")
+        params.append(str(end_date)[:10])
+    return " AND ".join(clauses) or "1", params
+
+
+def fts_query(text):
+    """FTS5 MATCH expression: any of the question's terms, each quoted so no token is read as syntax."""
+    terms = dict.fromkeys(t for t in WORD.findall(text.lower()) if t not in STOPWORDS)
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class SqliteDocstore(Docstore):
+    """Read-only docstore that fetches documents by id from docs.sqlite on demand."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def search(self, search):
+        rows = self.query("SELECT text, metadata FROM docs WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        text, metadata = rows[0]
+        return Document(id=search, page_content=text, metadata=json.loads(metadata))
+
+    def positions(self, symbol=None, sources=None, start_date=None, end_date=None):
+        """Index positions of chunks matching the filter (see _filter_sql)."""
+        where, params = _filter_sql(symbol, sources, start_date, end_date)
+        rows = self.query(f"SELECT position FROM docs WHERE {where}", params)
+        return np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+
+    def bm25(self, text, k, symbol=None, sources=None, start_date=None, end_date=None):
+        """Top-k (position, BM25 score) for the question's terms among chunks matching the filter."""
+        match = fts_query(text)
+        if not match:
+            return []
+        where, params = _filter_sql(symbol, sources, start_date, end_date)
+        # FTS5's bm25() is lower-is-better; negate it so higher scores rank first
+        return self.query(
+            f"SELECT docs.position, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} "
+            f"JOIN docs ON docs.position = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH ? AND {where} ORDER BY bm25({FTS_TABLE}) LIMIT ?",
+            [match, *params, k],
+        )
+
+    def by_positions(self, positions):
+        marks = ", ".join("?" * len(positions))
+        rows = self.query(f"SELECT position, id, text, metadata FROM docs WHERE position IN ({marks})",
+                          [int(p) for p in positions])
+        return {
+            position: Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            for position, doc_id, text, metadata in rows
+        }
+
+
+class LazyIdMap(Mapping):
+    """index position -> docstore id, resolved from docs.sqlite per lookup."""
+
+    def __init__(self, docstore):
+        self._docstore = docstore
+        self._len = docstore.query("SELECT COUNT(*) FROM docs")[0][0]
+
+    def __getitem__(self, position):
+        rows = self._docstore.query("SELECT id FROM docs WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __iter__(self):
+        return iter(range(self._len))
+
+    def __len__(self):
+        return self._len
+
+
+def save_vector_store(vector_store, index_path):
+    """Write the index and docstore next to the live files and swap them in."""
+    tmp_path = f"{index_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    index = vector_store.index
+    layout = "native"
+    if _is_flat(index):
+        index, layout = _flat_to_ivf1(index), FLAT_AS_IVF
+    generation = uuid.uuid4().hex
+    index_file = f"index-{generation}.faiss"
+    faiss.write_index(index, os.path.join(tmp_path, index_file))
+
+    db = sqlite3.connect(os.path.join(tmp_path, DOCS_FILE))
+    db.execute(
+        "CREATE TABLE docs (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, text TEXT, metadata TEXT, "
+        "symbol TEXT, source TEXT, date_start TEXT, date_end TEXT)"
+    )
+    db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    rows = []
+    for position, doc_id in sorted(vector_store.index_to_docstore_id.items()):
+        doc = vector_store.docstore.search(doc_id)
+        rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, default=str),
+                     *side_columns(doc.metadata)))
+    db.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    _create_side_indexes(db)
+    _create_fts(db)
+    db.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("layout", layout), ("ntotal", str(index.ntotal)), ("generation", generation), ("index_file", index_file),
+    ])
+    db.commit()
+    db.close()
+
+    # The new index file lands under its own name first; swapping docs.sqlite then switches readers over
+    os.makedirs(index_path, exist_ok=True)
+    for name in (index_file, DOCS_FILE):
+        os.replace(os.path.join(tmp_path, name), os.path.join(index_path, name))
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    # Readers that already mapped an older file keep it (unlinked) until they drop it
+    for path in glob.glob(os.path.join(index_path, "index*.faiss")) + [os.path.join(index_path, LEGACY_DOCS_FILE)]:
+        if os.path.basename(path) != index_file and os.path.exists(path):
+            os.remove(path)
+
+
+def _convert_legacy(index_path, embeddings):
+    print(f"🔁 Converting {index_path} from pickle to the SQLite docstore format.")
+    legacy = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    save_vector_store(legacy, index_path)
+
+
+def _read_meta(docs_path):
+    db = sqlite3.connect(f"file:{docs_path}?mode=ro", uri=True)
+    try:
+        return dict(db.execute("SELECT key, value FROM meta").fetchall())
+    finally:
+        db.close()
+
+
+def _is_legacy(index_path):
+    # A pickle directory is only an index with both halves; a stray index.pkl is rebuilt from source
+    return (not os.path.exists(os.path.join(index_path, DOCS_FILE))
+            and all(os.path.exists(os.path.join(index_path, name)) for name in (LEGACY_INDEX_FILE, LEGACY_DOCS_FILE)))
+
+
+def index_exists(index_path):
+    return os.path.exists(os.path.join(index_path, DOCS_FILE)) or _is_legacy(index_path)
+
+
+def is_current_format(index_path):
+    """
+    Whether the directory has the current layout (generation-named index file,
+    side columns, FTS table). Older layouts are rewritten by sync_index.
+    """
+    docs_path = os.path.join(index_path, DOCS_FILE)
+    if not os.path.exists(docs_path):
+        return False
+    db = sqlite3.connect(f"file:{docs_path}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in db.execute("PRAGMA table_info(docs)")}
+        has_fts = db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)).fetchone()
+        generation = db.execute("SELECT 1 FROM meta WHERE key = 'generation'").fetchone()
+    finally:
+        db.close()
+    return set(SIDE_COLUMNS) <= columns and bool(has_fts) and bool(generation)
+
+
+def load_vector_store(index_path, embeddings, writable=False):
+    """
+    Open an index directory.
+
+    Read-only (default): vectors are memory-mapped where faiss supports it (IVF
+    codes, so also flat indexes in the single-list layout) and documents/ids are
+    fetched lazily from SQLite; nothing is unpickled, nothing is written and
+    load time is independent of index size. The index file and docstore are
+    checked to be the same generation; a load that keeps racing concurrent
+    saves raises RuntimeError.
+    writable=True: everything is loaded into memory as a regular LangChain FAISS
+    store for add/delete, to be written back with save_vector_store. Pickled
+    index.pkl directories are converted here.
+    """
+    docs_path = os.path.join(index_path, DOCS_FILE)
+    if _is_legacy(index_path):
+        if not writable:
+            raise RuntimeError(f"{index_path} is in the legacy pickle format; run the index build to convert it")
+        _convert_legacy(index_path, embeddings)
+    elif not os.path.exists(docs_path):
+        raise FileNotFoundError(f"No index in {index_path}; run the index build")
+
+    if writable:
+        meta = _read_meta(docs_path)
+        layout = meta.get("layout")
+        index = faiss.read_index(os.path.join(index_path, meta.get("index_file", LEGACY_INDEX_FILE)))
+        if layout == FLAT_AS_IVF:
+            index = _ivf1_to_flat(index)
+        db = sqlite3.connect(f"file:{docs_path}?mode=ro", uri=True)
+        rows = db.execute("SELECT position, id, text, metadata FROM docs ORDER BY position").fetchall()
+        db.close()
+        docstore = InMemoryDocstore({
+            doc_id: Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            for _, doc_id, text, metadata in rows
+        })
+        return FAISS(embeddings, index, docstore, {position: doc_id for position, doc_id, _, _ in rows})
+
+    # A save between reading the meta and opening the docstore shows up as a generation
+    # mismatch (or a vanished index file); retry against the new generation
+    for attempt in range(LOAD_ATTEMPTS):
+        meta = _read_meta(docs_path)
+        index_file = os.path.join(index_path, meta.get("index_file", LEGACY_INDEX_FILE))
+        try:
+            try:
+                index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                index = faiss.read_index(index_file)
+        except RuntimeError:
+            if os.path.exists(index_file):
+                raise
+            time.sleep(0.1)
+            continue
+        docstore = SqliteDocstore(docs_path)
+        current = dict(docstore.query("SELECT key, value FROM meta"))
+        if current.get("generation") == meta.get("generation") and int(current["ntotal"]) == index.ntotal:
+            return FAISS(embeddings, index, docstore, LazyIdMap(docstore))
+        time.sleep(0.1)
+
+    raise RuntimeError(f"Could not load a consistent {index_path} after {LOAD_ATTEMPTS} attempts (concurrent saves)")
+
+
+def _search_params(index, selector, selectivity):
+    """Search parameters carrying an id selector; IVF/HNSW search wider when the filter is selective."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        nprobe = min(ivf.nlist, int(np.ceil(ivf.nprobe / max(selectivity, 1e-6))))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        ef_search = min(4096, int(np.ceil(index.hnsw.efSearch / max(selectivity, 1e-6))))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_search(vector_store, query, k=4, symbol=None, sources=None, start_date=None, end_date=None,
+                    embedding=None):
+    """
+    Top-k (Document, distance) pairs among chunks matching the metadata filter.
+    Candidate positions come from the docs.sqlite side columns and are handed to
+    faiss as an IDSelectorBatch, so non-matching vectors are never scored.
+    Pass `embedding` to reuse a query vector already computed for other indexes.
+    """
+    docstore = vector_store.docstore
+    if not isinstance(docstore, SqliteDocstore):
+        raise TypeError("filtered_search needs a store opened read-only with load_vector_store")
+
+    index = vector_store.index
+    if embedding is None:
+        embedding = vector_store.embedding_function.embed_query(query)
+    vector = np.asarray([embedding], dtype=np.float32)
+    if not any((symbol, sources, start_date, end_date)):
+        distances, positions = index.search(vector, k)
+    else:
+        candidates = docstore.positions(symbol, sources, start_date, end_date)
+        if not len(candidates):
+            return []
+        selector = faiss.IDSelectorBatch(len(candidates), faiss.swig_ptr(candidates))
+        params = _search_params(index, selector, len(candidates) / max(index.ntotal, 1))
+        distances, positions = index.search(vector, min(k, len(candidates)), params=params)
+
+    hits = [(int(p), float(d)) for p, d in zip(positions[0], distances[0]) if p >= 0]
+    docs = docstore.by_positions([p for p, _ in hits]) if hits else {}
+    return [(docs[p], d) for p, d in hits if p in docs]
+
+
+def lexical_search(vector_store, query, k=4, symbol=None, sources=None, start_date=None, end_date=None):
+    """Top-k (Document, BM25 score) pairs from the docs.sqlite text index; no embedding call."""
+    docstore = vector_store.docstore
+    if not isinstance(docstore, SqliteDocstore):
+        raise TypeError("lexical_search needs a store opened read-only with load_vector_store")
+    hits = docstore.bm25(query, k, symbol, sources, start_date, end_date)
+    docs = docstore.by_positions([p for p, _ in hits]) if hits else {}
+    return [(docs[p], score) for p, score in hits if p in docs]
@@ -0,0 +1,72 @@
+import asyncio
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    Write-behind stage for ingestion jobs.
+
+    Coroutines hand parsed DataFrames to `submit`, which only blocks when
+    `max_pending` frames are already waiting (backpressure). A single background
+    consumer coalesces queued frames into batches of up to `batch_rows` rows and
+    runs the synchronous `save_fn` on a dedicated thread, so database writes
+    overlap with in-flight HTTP requests instead of freezing the event loop.
+    `save_fn` returns the number of rows it wrote and raises on failure, so
+    `rows_written` only counts rows that reached the database.
+
+        async with WriteBehindWriter(save_to_postgres, label="prices") as writer:
+            await writer.submit(df)
+    """
+
+    def __init__(self, save_fn, max_pending=8, batch_rows=50_000, label="writer"):
+        self.save_fn = save_fn
+        self.max_pending = max_pending
+        self.batch_rows = batch_rows
+        self.label = label
+        self.rows_written = 0
+        self._queue = None
+        self._consumer = None
+        self._executor = None
+
+    async def __aenter__(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.label}-db")
+        self._consumer = asyncio.create_task(self._drain())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._queue.put(_STOP)
+        await self._consumer
+        self._executor.shutdown(wait=True)
+        print(f"[{self.label}] 💾 Write-behind flushed {self.rows_written} rows.")
+
+    async def submit(self, df):
+        if df is not None and not df.empty:
+            await self._queue.put(df)
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            frames, rows = [item], len(item)
+            while rows < self.batch_rows and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                frames.append(item)
+                rows += len(item)
+
+            batch = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            try:
+                self.rows_written += await loop.run_in_executor(self._executor, self.save_fn, batch)
+            except Exception as e:
+                print(f"[{self.label}] ❌ Write-behind batch of {len(batch)} rows failed: {e}")